@@ -0,0 +1,276 @@
+"""Benchmarks the hot paths of inlist access and defaults loading.
+
+Usage:
+    python benchmarks/bench_access.py [-n REPEAT] [-k FILTER]
+                                      [--json OUT] [--compare BASELINE]
+
+Runs offline against the defaults bundled with mesatools (mesa-r10108 and
+mesa-r15140) and the inlists in mesatools/test. For every operation the best
+and median time and the peak memory allocated while running it once are
+reported. Results written with --json can be passed to --compare on a later
+commit to see the relative change.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+import f90nml
+
+# run from a checkout, without installing mesatools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mesatools.access import MesaAccess
+from mesatools.include import clearIncludes
+from mesatools.registry import clearRegistry
+from mesatools.utils.definitions import cacheEnv
+
+package_dir = os.path.join(os.path.dirname(__file__), "..", "mesatools")
+datasets = {
+    "r10108": (os.path.join(package_dir, "test", "inlist.nml"), True),
+    "r15140": (os.path.join(package_dir, "test", "inlist_15140.nml"), False),
+}
+
+
+class CacheDirs:
+    """Temporary schema cache directories for cold and warm runs."""
+
+    def __init__(self) -> None:
+        self.root = tempfile.mkdtemp(prefix="mesatools-bench-")
+        self.warm = os.path.join(self.root, "warm")
+        self.count = 0
+
+    def cold(self) -> None:
+        """Points the schema cache to an empty directory, drops the registry."""
+        self.count += 1
+        os.environ[cacheEnv] = os.path.join(self.root, f"cold-{self.count}")
+        clearRegistry()
+        clearIncludes()
+
+    def disk(self) -> None:
+        """Uses the populated schema cache, but drops the registry."""
+        os.environ[cacheEnv] = self.warm
+        clearRegistry()
+        clearIncludes()
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def make_access(infile: str, legacy: bool, outfile: str, **kwargs: Any) -> MesaAccess:
+    return MesaAccess(
+        infile=infile,
+        outfile=outfile,
+        useMesaenv=False,
+        legacyInlist=legacy,
+        suppressWarnings=True,
+        **kwargs,
+    )
+
+
+def measure(
+    setup: Callable[[], Any], func: Callable[[Any], Any], repeat: int, number: int
+) -> Dict[str, float]:
+    """Times func(setup()) and records its peak memory.
+
+    Args:
+        setup (Callable): Builds the state passed to func, not timed.
+        func (Callable): Operation to measure.
+        repeat (int): Number of timed rounds, each with a fresh setup.
+        number (int): Calls of func per round.
+
+    Returns:
+        result (dict): Best and median seconds per call and peak bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                func(state)
+            times.append((time.perf_counter() - start) / number)
+        finally:
+            gc.enable()
+
+    state = setup()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func(state)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return {"best": min(times), "median": statistics.median(times), "peak": peak}
+
+
+def build_benchmarks(caches: CacheDirs, outfile: str) -> List[tuple]:
+    """Lists (name, setup, func, number) for every benchmark."""
+    benchmarks = []
+    for label, (infile, legacy) in datasets.items():
+        access = partial(make_access, infile, legacy, outfile)
+
+        def warm(access=access) -> MesaAccess:
+            caches.disk()
+            m = access()
+            m["max_age"] = 1e9
+            return m
+
+        def cold_access(access=access) -> MesaAccess:
+            caches.cold()
+            return access()
+
+        def disk_access(access=access) -> MesaAccess:
+            caches.disk()
+            return access()
+
+        def reload_access(access=access) -> MesaAccess:
+            caches.disk()
+            return access(reloadDefaults=True)
+
+        def unexpanded(access=access, warm=warm) -> MesaAccess:
+            warm()
+            return access(expandVectors=False)
+
+        def set_vector(m: MesaAccess) -> None:
+            m["x_ctrl(3)"] = 1.0
+
+        def write_patched(m: MesaAccess) -> None:
+            m.writeFile(preserveLayout=True)
+
+        benchmarks += [
+            (f"{label}/construct_cold", caches.cold, lambda _, a=access: a(), 1),
+            (f"{label}/construct_disk", caches.disk, lambda _, a=access: a(), 1),
+            (f"{label}/construct_warm", warm, lambda _, a=access: a(), 20),
+            (f"{label}/first_set_cold", cold_access, set_max_age, 1),
+            (f"{label}/first_set_disk", disk_access, set_max_age, 1),
+            (
+                f"{label}/get_defaults_reload",
+                reload_access,
+                lambda m: m.getDefaults("controls"),
+                1,
+            ),
+            (f"{label}/fix_vectors", unexpanded, fix_vectors, 1),
+            (f"{label}/set_scalar", warm, set_max_age, 1000),
+            (f"{label}/set_vector", warm, set_vector, 1000),
+            (f"{label}/set_vector_unexpanded", unexpanded, set_vector, 1000),
+            (f"{label}/apply", warm, apply_items, 200),
+            (f"{label}/write_file", warm, lambda m: m.writeFile(), 50),
+            (f"{label}/write_file_patched", warm, write_patched, 50),
+        ]
+    return benchmarks
+
+
+def set_max_age(m: MesaAccess) -> None:
+    m["max_age"] = 1e9
+
+
+def fix_vectors(m: MesaAccess) -> None:
+    m.fixVectors()
+
+
+def apply_items(m: MesaAccess) -> None:
+    m.apply(
+        {
+            "max_age": 1e9,
+            "initial_mass": 1.0,
+            "x_ctrl(2)": 2.0,
+            "x_ctrl(5)": 5.0,
+            "pgstar_flag": False,
+        }
+    )
+
+
+def get_commit() -> str:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(__file__),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return output.stdout.strip()
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:8.2f} {unit:>2}"
+    return f"{seconds * 1e9:8.2f} ns"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("-k", "--filter", default="", help="only run matching names")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results of an earlier --json run")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+
+    caches = CacheDirs()
+    outfile = os.path.join(caches.root, "inlist_out")
+    previous_env = os.environ.get(cacheEnv)
+    results = {}
+    try:
+        # populate the warm schema cache once
+        caches.disk()
+        for infile, legacy in datasets.values():
+            m = make_access(infile, legacy, outfile)
+            for section in m.schema.sections:
+                m.schema.getDefaults(section)
+
+        header = f"{'benchmark':<40} {'best':>11} {'median':>11} {'peak [KiB]':>11}"
+        print(header + (f" {'vs base':>8}" if baseline else ""))
+        for name, setup, func, number in build_benchmarks(caches, outfile):
+            if args.filter not in name:
+                continue
+            result = measure(setup, func, args.repeat, number)
+            results[name] = result
+            line = (
+                f"{name:<40} {format_time(result['best'])}"
+                f" {format_time(result['median'])} {result['peak'] / 1024:11.1f}"
+            )
+            if name in baseline:
+                line += f" {result['median'] / baseline[name]['median']:7.2f}x"
+            print(line)
+    finally:
+        caches.cleanup()
+        if previous_env is None:
+            os.environ.pop(cacheEnv, None)
+        else:
+            os.environ[cacheEnv] = previous_env
+
+    if args.json:
+        report = {
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "f90nml": f90nml.__version__,
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmarks skipping ./mk for a work directory whose star is up to date.
+
+Usage:
+    python benchmarks/bench_build.py [-s SOURCES] [-d DIR]
+
+Writes a synthetic work directory whose mk script sleeps like a compiler
+and writes objects, modules and star, then times a first build_star call
+that runs it and a second call on the unchanged tree, which must skip it.
+A changed source must trigger a rebuild again.
+"""
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+# run from a checkout, without installing mesatools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mesatools.build import build_star
+
+mk_script = """#!/bin/sh
+sleep 1
+for source in src/*.f90; do
+    name=$(basename "$source" .f90)
+    date +%s%N > "make/$name.o"
+    date +%s%N > "make/$name.mod"
+done
+date +%s%N > make/libextras.a
+date +%s%N > star
+"""
+
+
+def write_work_dir(work_dir: str, sources: int) -> None:
+    os.makedirs(os.path.join(work_dir, "make"))
+    os.makedirs(os.path.join(work_dir, "src"))
+    mk = os.path.join(work_dir, "mk")
+    with open(mk, "w") as file:
+        file.write(mk_script)
+    os.chmod(mk, os.stat(mk).st_mode | stat.S_IXUSR)
+    with open(os.path.join(work_dir, "make", "makefile"), "w") as file:
+        file.write("include $(MESA_DIR)/star/work_standard_makefile\n")
+    for i in range(sources):
+        with open(os.path.join(work_dir, "src", f"extras_{i}.f90"), "w") as file:
+            file.write(f"module extras_{i}\n" + "! padding\n" * 1000)
+            file.write(f"end module extras_{i}\n")
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--sources", type=int, default=20)
+    parser.add_argument("-d", "--dir", help="directory to run in")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="mesatools-bench-", dir=args.dir)
+    try:
+        work_dir = os.path.join(root, "work")
+        write_work_dir(work_dir, args.sources)
+
+        seconds, built = timed(build_star, work_dir)
+        print(f"{'build_star, ./mk':<32} {seconds:8.3f} s")
+        assert built, "the first call did not run ./mk"
+        seconds, built = timed(build_star, work_dir)
+        print(f"{'build_star, up to date':<32} {seconds:8.3f} s")
+        assert not built, "./mk ran again on an unchanged tree"
+
+        with open(os.path.join(work_dir, "src", "extras_0.f90"), "a") as file:
+            file.write("! changed\n")
+        seconds, built = timed(build_star, work_dir)
+        print(f"{'build_star, changed source':<32} {seconds:8.3f} s")
+        assert built, "./mk did not run after a source changed"
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
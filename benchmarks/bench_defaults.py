@@ -0,0 +1,86 @@
+"""Compares the .defaults parser against the previous f90nml based path.
+
+Usage:
+    python benchmarks/bench_defaults.py [-n REPEAT]
+
+Both parsers are run over the defaults bundled with mesatools and their
+results, apart from the vector bounds only the new parser records, are
+checked for equality.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import f90nml
+
+# run from a checkout, without installing mesatools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mesatools.parser import parseDefaults
+
+defaults_dir = os.path.join(os.path.dirname(__file__), "..", "mesatools", "defaults")
+
+
+def parse_defaults_f90nml(src: str, section: str) -> dict:
+    """The previous cache-miss path: strip comments, then run f90nml."""
+    defaults = ["&" + section]
+    with open(src) as file:
+        for line in file.readlines():
+            line = line.strip()
+            if line.startswith("!") or not line:
+                continue
+            else:
+                if "num_x_ctrls" in line:
+                    line = line.replace("num_x_ctrls", "10")
+                defaults.append(line)
+    defaults.append("/")
+
+    nml = f90nml.reads("\n".join(defaults))[section]
+    return {
+        "names": list(nml.keys()),
+        "defaults": list(nml.values()),
+        "starts": {key: list(start) for key, start in nml.start_index.items()},
+    }
+
+
+def timeit(func, *args, repeat: int = 1) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'file':<40} {'f90nml [s]':>12} {'parser [s]':>12} {'speedup':>9}")
+    total_old = total_new = 0.0
+    for src in sorted(glob.glob(os.path.join(defaults_dir, "*", "*.defaults"))):
+        section = os.path.basename(src).split(".")[0]
+        name = os.path.relpath(src, defaults_dir)
+        entry = parseDefaults(src, section)
+        # f90nml does not keep the bounds of vectors
+        del entry["bounds"]
+        if entry != parse_defaults_f90nml(src, section):
+            raise SystemExit(f"parsers disagree on {name}")
+
+        t_old = timeit(parse_defaults_f90nml, src, section, repeat=1)
+        t_new = timeit(parseDefaults, src, section, repeat=args.repeat)
+        total_old += t_old
+        total_new += t_new
+        print(f"{name:<40} {t_old:12.4f} {t_new:12.4f} {t_old / t_new:8.0f}x")
+    print(
+        f"{'total':<40} {total_old:12.4f} {total_new:12.4f}"
+        f" {total_old / total_new:8.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measures the import time of mesatools and guards against heavy imports.
+
+Usage:
+    python benchmarks/bench_import.py [-n REPEAT] [--max-ms LIMIT]
+
+Every statement is timed in fresh interpreters. Importing the package or
+its classes must not load numpy, mesa_reader, pandas, matplotlib or
+distutils; the script exits with an error if one of them is loaded or if
+a median import time exceeds --max-ms.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+heavy_modules = ["numpy", "mesa_reader", "pandas", "matplotlib", "distutils"]
+statements = [
+    "import mesatools",
+    "from mesatools import MesaInlist",
+    "from mesatools import MesaRunner",
+    "from mesatools.utils.functions import get_latest_log",
+]
+
+probe = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def time_import(statement: str) -> dict:
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe.format(statement=statement, heavy=heavy_modules)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(output.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--repeat", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'statement':<56} {'best [ms]':>10} {'median [ms]':>12}")
+    for statement in statements:
+        runs = [time_import(statement) for _ in range(args.repeat)]
+        times = [run["elapsed"] * 1e3 for run in runs]
+        median = statistics.median(times)
+        print(f"{statement:<56} {min(times):10.1f} {median:12.1f}")
+        heavy = sorted({name for run in runs for name in run["heavy"]})
+        if heavy:
+            failures.append(f"{statement} loads {', '.join(heavy)}")
+        if args.max_ms is not None and median > args.max_ms:
+            failures.append(f"{statement} takes {median:.1f} ms")
+
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
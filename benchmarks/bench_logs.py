@@ -0,0 +1,86 @@
+"""Benchmarks archiving the LOGS directory of a run.
+
+Usage:
+    python benchmarks/bench_logs.py [-p PROFILES] [-s SIZE_KIB] [-d DIR]
+
+Creates a synthetic LOGS directory with a history and PROFILES profiles and
+times a full archive with every method, an incremental archive after one
+more profile was written, packing into a tar archive and cleaning up the
+logs serially and with threads. Pass -d to run on
+a specific file system, e.g. one with reflinks.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# run from a checkout, without installing mesatools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mesatools.cleanup import clean_run_dirs
+from mesatools.utils.fileops import archive_tree, pack_tree
+
+
+def make_logs(path: str, profiles: int, size: int) -> None:
+    os.makedirs(path)
+    block = os.urandom(size)
+    for i in range(1, profiles + 1):
+        with open(os.path.join(path, f"profile{i}.data"), "wb") as file:
+            file.write(block)
+    with open(os.path.join(path, "history.data"), "wb") as file:
+        file.write(block)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-p", "--profiles", type=int, default=2000)
+    parser.add_argument("-s", "--size", type=int, default=256, help="KiB per file")
+    parser.add_argument("-d", "--dir", help="directory to run in")
+    parser.add_argument("-t", "--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="mesatools-bench-", dir=args.dir)
+    try:
+        logs = os.path.join(root, "LOGS")
+        make_logs(logs, args.profiles, args.size * 1024)
+
+        start = time.perf_counter()
+        shutil.copytree(logs, os.path.join(root, "copytree"))
+        print(f"{'shutil.copytree':<24} {time.perf_counter() - start:8.3f} s")
+
+        for method in ("copy", "auto", "link"):
+            dst = os.path.join(root, method)
+            stats = archive_tree(logs, dst, method)
+            print(f"{'archive ' + method:<24} {stats.seconds:8.3f} s  {stats}")
+
+        with open(os.path.join(logs, f"profile{args.profiles + 1}.data"), "wb") as file:
+            file.write(os.urandom(args.size * 1024))
+        with open(os.path.join(logs, "history.data"), "ab") as file:
+            file.write(b"more rows\n")
+        stats = archive_tree(logs, os.path.join(root, "copy"), "copy")
+        print(f"{'archive incremental':<24} {stats.seconds:8.3f} s  {stats}")
+
+        for compression in ("", "gz"):
+            archive = os.path.join(
+                root, "LOGS.tar" + (f".{compression}" if compression else "")
+            )
+            stats = pack_tree(logs, archive, compression)
+            label = f"pack {compression or 'tar'}"
+            print(f"{label:<24} {stats.seconds:8.3f} s  {stats}")
+
+        for threads in (1, args.threads):
+            run_dir = os.path.join(root, f"run_{threads}")
+            archive_tree(logs, os.path.join(run_dir, "LOGS"), "link")
+            start = time.perf_counter()
+            removed = clean_run_dirs(run_dir, threads=threads)
+            label = f"cleanup {threads} threads"
+            print(f"{label:<24} {time.perf_counter() - start:8.3f} s  {removed} files")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmarks loading a series of MESA profiles onto a common mass grid.
+
+Usage:
+    python benchmarks/bench_profiles.py [-n PROFILES] [-z ZONES] [-p PROCESSES]
+
+Writes a synthetic LOGS directory and times a loop over the profiles that
+reads each one with mesa_reader and interpolates it with np.interp, against
+load_profile_series without and with sidecars. The interpolated values of
+both are compared.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# run from a checkout, without installing mesatools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mesatools.profiles import load_profile_series, read_profile_index
+
+
+def write_logs(log_dir: str, profiles: int, zones: int) -> None:
+    os.makedirs(log_dir)
+    rng = np.random.default_rng(0)
+    with open(os.path.join(log_dir, "profiles.index"), "w") as index:
+        index.write(f"{profiles} models.    lines hold model number, priority, ")
+        index.write("and log file number.\n")
+        for number in range(1, profiles + 1):
+            model = 10 * number
+            index.write(f"{model:10d} {1:10d} {number:10d}\n")
+            n = zones + int(rng.integers(-zones // 10, zones // 10))
+            mass = np.linspace(1.0 - 1e-4 * number / profiles, 0.0, n)
+            values = np.column_stack(
+                [np.arange(1, n + 1), mass, rng.random(n), rng.random(n)]
+            )
+            file_name = os.path.join(log_dir, f"profile{number}.data")
+            with open(file_name, "w") as file:
+                file.write("1 2 3\nmodel_number star_age version_number\n")
+                file.write(f"{model} {1e6 * number:26.16E} 15140\n\n")
+                file.write("1 2 3 4\nzone mass logT logRho\n")
+                np.savetxt(file, values, fmt="%26.16E")
+
+
+def interp_loop(log_dir: str, columns: list, grid: np.ndarray) -> dict:
+    import mesa_reader
+
+    data = {name: [] for name in columns}
+    for entry in read_profile_index(log_dir):
+        file_name = os.path.join(log_dir, f"profile{entry.profile_number}.data")
+        profile = mesa_reader.MesaData(file_name)
+        mass = profile.data("mass")[::-1]
+        for name in columns:
+            values = np.interp(grid, mass, profile.data(name)[::-1])
+            values[(grid < mass[0]) | (grid > mass[-1])] = np.nan
+            data[name].append(values)
+    return {name: np.array(rows) for name, rows in data.items()}
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--profiles", type=int, default=1000)
+    parser.add_argument("-z", "--zones", type=int, default=1500)
+    parser.add_argument("-p", "--processes", type=int)
+    parser.add_argument("-d", "--dir", help="directory to run in")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="mesatools-bench-", dir=args.dir)
+    columns = ["logT", "logRho"]
+    try:
+        log_dir = os.path.join(root, "LOGS")
+        write_logs(log_dir, args.profiles, args.zones)
+        print(f"{args.profiles} profiles of about {args.zones} zones")
+
+        series_args = dict(log_dir=log_dir, processes=args.processes)
+        seconds, series = timed(load_profile_series, columns, **series_args)
+        print(f"{'load_profile_series, parse':<32} {seconds:8.3f} s")
+        seconds, cached = timed(load_profile_series, columns, **series_args)
+        print(f"{'load_profile_series, sidecars':<32} {seconds:8.3f} s")
+        seconds, _ = timed(load_profile_series, columns, stride=10, **series_args)
+        print(f"{'load_profile_series, stride 10':<32} {seconds:8.3f} s")
+
+        try:
+            import mesa_reader  # noqa: F401
+        except ImportError:
+            reference = None
+        else:
+            seconds, reference = timed(interp_loop, log_dir, columns, series.grid)
+            print(f"{'mesa_reader and np.interp':<32} {seconds:8.3f} s")
+
+        for name in columns:
+            assert np.array_equal(series.data[name], cached.data[name], True), name
+            if reference is not None:
+                assert np.allclose(
+                    series.data[name], reference[name], equal_nan=True
+                ), name
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
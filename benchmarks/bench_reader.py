@@ -0,0 +1,87 @@
+"""Benchmarks reading MESA history files.
+
+Usage:
+    python benchmarks/bench_reader.py [-r ROWS] [-c COLUMNS] [-d DIR]
+
+Writes a synthetic history file and times mesa_reader, a first read_data
+call that parses the file and writes the sidecar, and a second call that
+memory maps the sidecar, loading all columns and a few selected ones. The
+values read by both readers are compared.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# run from a checkout, without installing mesatools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mesatools.reader import read_data
+
+
+def write_history(file_name: str, rows: int, columns: int) -> None:
+    names = ["model_number", "star_age"] + [f"col_{i}" for i in range(columns - 2)]
+    values = np.random.default_rng(0).random((rows, columns))
+    values[:, 0] = np.arange(1, rows + 1)
+    values[:, 2] = 1e-120  # written with a three digit exponent
+    with open(file_name, "w") as file:
+        file.write('1 2\nversion_number compiler\n15140 "gfortran"\n\n')
+        file.write(" ".join(str(i + 1) for i in range(columns)) + "\n")
+        file.write(" ".join(names) + "\n")
+        for row in values:
+            line = " ".join(f"{value:26.16E}" for value in row)
+            file.write(line.replace("E-120", "-120") + "\n")
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-r", "--rows", type=int, default=50000)
+    parser.add_argument("-c", "--columns", type=int, default=80)
+    parser.add_argument("-d", "--dir", help="directory to run in")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="mesatools-bench-", dir=args.dir)
+    try:
+        history = os.path.join(root, "history.data")
+        write_history(history, args.rows, args.columns)
+        print(f"history.data: {os.path.getsize(history) / 2**20:.1f} MiB")
+
+        try:
+            import mesa_reader
+        except ImportError:
+            reference = None
+        else:
+            seconds, reference = timed(mesa_reader.MesaData, history)
+            print(f"{'mesa_reader':<28} {seconds:8.3f} s")
+
+        seconds, data = timed(read_data, history, cache=False)
+        print(f"{'read_data, no sidecar':<28} {seconds:8.3f} s")
+        seconds, _ = timed(read_data, history)
+        print(f"{'read_data, write sidecar':<28} {seconds:8.3f} s")
+        seconds, cached = timed(read_data, history)
+        print(f"{'read_data, from sidecar':<28} {seconds * 1e3:8.3f} ms")
+        selected = ["model_number", "star_age"]
+        seconds, _ = timed(read_data, history, columns=selected)
+        print(f"{'read_data, 2 columns':<28} {seconds * 1e3:8.3f} ms")
+
+        for name in data.names:
+            assert np.array_equal(data[name], cached[name]), name
+            if reference is not None:
+                assert np.allclose(data[name], reference.data(name)), name
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,29 @@
-from mesatools.inlist import MesaInlist
-from mesatools.runner import MesaRunner
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# the public classes are imported on first access, so that scripts which only
+# edit inlists do not pay for numpy or matplotlib
+lazyAttributes = {
+    "MesaInlist": "mesatools.inlist",
+    "MesaRunner": "mesatools.runner",
+    "MesaDebugger": "mesatools.debugger",
+}
+
+__all__ = list(lazyAttributes)
+
+if TYPE_CHECKING:
+    from mesatools.debugger import MesaDebugger
+    from mesatools.inlist import MesaInlist
+    from mesatools.runner import MesaRunner
+
+
+def __getattr__(name: str) -> Any:
+    if name in lazyAttributes:
+        value = getattr(importlib.import_module(lazyAttributes[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__} has no attribute {name}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,14 +1,41 @@
+import io
 import os
-import pickle
 import re
 from collections import OrderedDict
+from functools import partial
 from pathlib import Path
-from typing import Any, Tuple
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
 
 import f90nml
 
+from mesatools.cache import CacheEntry, loadSchemaCache
+from mesatools.include import EffectiveInlist, resolveIncludes
+from mesatools.parser import parseDefaults, splitComment
+from mesatools.registry import DefaultsRegistry, defaultsRegistry, getMesaVersion
+from mesatools.schema import LazySections
 from mesatools.utils.definitions import *
 
+vectorRegex = re.compile(r"(\w*) (\( [0-9]+ \))", re.VERBOSE)
+assignmentRegex = re.compile(r"(\w+)\s*\(\s*([0-9]+)\s*\)\s*=")
+scalarTypes = (bool, int, float, str)
+
+# layout of an inlist line: indentation, name, index and section markers
+lineRegex = re.compile(r"^(\s*)([A-Za-z]\w*)\s*(?:\(([^)]*)\))?\s*=")
+keyRegex = re.compile(r"[A-Za-z]\w*\s*(?:\([^)]*\))?\s*=")
+stringRegex = re.compile(r"'[^']*'|\"[^\"]*\"")
+groupRegex = re.compile(r"^\s*&(\w+)(.*)$")
+
+
+class CheckedItem(NamedTuple):
+    key: str
+    value: Any
+    isVector: bool
+    vectorKey: str
+    vectorIndex: int
+    section: str
+    default: Any
+    warning: str
+
 
 class MesaAccess:
     """Reads & writes MESA inlists.
@@ -39,45 +66,61 @@ class MesaAccess:
         self.useMesaenv = useMesaenv
         self.legacyInlist = legacyInlist
         self.suppressWarnings = suppressWarnings
-        self.nml = f90nml.read(self.infile)
+        with open(self.infile) as file:
+            self.inlistLines = file.readlines()
+        self.nml = f90nml.reads("".join(self.inlistLines))
         self.nml.float_format = ".3e"
-
-        self.controls = self.getDefaults("controls")
-        self.pgstar = self.getDefaults("pgstar")
-        self.star_job = self.getDefaults("star_job")
-        if not self.legacyInlist:
-            self.eos = self.getDefaults("eos")
-            self.kap = self.getDefaults("kap")
-
-        self.controls_keys = self.controls[sectionControls].keys()
-        self.pgstar_keys = self.pgstar[sectionPgStar].keys()
-        self.star_job_keys = self.star_job[sectionStarJob].keys()
-        if not self.legacyInlist:
-            self.eos_keys = self.eos[sectionEos].keys()
-            self.kap_keys = self.kap[sectionKap].keys()
-
-        self.default_keys = (
-            list(self.controls_keys) + list(self.pgstar_keys) + list(self.star_job_keys)
-        )
-
+        self.vectorTable = self.scanVectors(self.inlistLines)
+        # keys changed since reading, patched into the text by writeFile
+        self.dirtyKeys: Dict[Tuple[str, str], None] = OrderedDict()
+        self.inlistLayout = None
+
+        # key -> section index, shared between instances; the defaults of a
+        # section are only loaded once one of its keys needs them
+        self.sections = ["controls", "pgstar", "star_job"]
         if not self.legacyInlist:
-            self.default_keys = self.default_keys + (
-                list(self.eos_keys) + list(self.kap_keys)
+            self.sections = self.sections + ["eos", "kap"]
+        self.defaultsKeys = OrderedDict()
+        specs = []
+        version = self.getVersion()
+        for whichDefaults in self.sections:
+            src, loader = self.getDefaultsSource(whichDefaults, version)
+            key = DefaultsRegistry.makeKey(src, version, whichDefaults)
+            self.defaultsKeys[whichDefaults] = key
+            if self.reloadDefaults:
+                defaultsRegistry.get(key, loader, reload=True)
+            boundsLoader = partial(
+                readBounds,
+                whichDefaults,
+                self.findDefaultsDir(whichDefaults),
+                version,
+                self.reloadDefaults,
             )
-
-        self.fullDict = OrderedDict()
-        self.fullDict[sectionStarJob] = dict(self.star_job[sectionStarJob])
-        self.fullDict[sectionControls] = dict(self.controls[sectionControls])
-        self.fullDict[sectionPgStar] = dict(self.pgstar[sectionPgStar])
-        if not self.legacyInlist:
-            self.fullDict[sectionEos] = dict(self.eos[sectionEos])
-            self.fullDict[sectionKap] = dict(self.kap[sectionKap])
+            specs.append((sectionDict[whichDefaults], key, src, loader, boundsLoader))
+        self.schema = defaultsRegistry.getSchema(specs)
+        self.default_keys = self.schema
+
+        # the section views are shared between instances and read-only
+        self.fullDict = LazySections(
+            self.schema,
+            [sectionStarJob, sectionControls, sectionPgStar]
+            + ([] if self.legacyInlist else [sectionEos, sectionKap]),
+        )
 
         self.expandedVectors = False
         if self.expandVectors:
             self.fixVectors()
             self.expandedVectors = True
 
+    def __getattr__(self, name: str) -> Any:
+        # defaults sections and their keys are only loaded on access
+        whichDefaults = name[: -len("_keys")] if name.endswith("_keys") else name
+        if whichDefaults in self.__dict__.get("sections", []):
+            if name.endswith("_keys"):
+                return self.schema.getDefaults(sectionDict[whichDefaults]).keys()
+            return self.getSharedDefaults(whichDefaults)
+        raise AttributeError(f"{type(self).__name__} has no attribute {name}")
+
     def items(self):
         return self.nml.items()
 
@@ -90,80 +133,150 @@ class MesaAccess:
     def __getitem__(self, key: str) -> Any:
         key = self.formatKey(key)
         whichSection = self.getSection(key)
+        section = self.nml[whichSection]
+        if key in section:
+            return section[key]
         _, key, _ = self.checkVector(key)
-        return self.nml[whichSection][key]
+        return section[key]
 
     def __setitem__(self, key: str, value: float) -> None:
-        key = self.formatKey(key)
-        whichSection = self.getSection(key)
-        section = self.nml[whichSection]
-        section_keys = section.keys()
+        item = self.checkItem(key, value)
+        if item.warning and not self.suppressWarnings:
+            print(item.warning)
+        self.assignItem(item)
+
+    def apply(self, items: Mapping[str, Any] = None, **kwargs: Any) -> None:
+        """Sets several keys in a single pass.
+
+        All keys and values are validated before anything is set, so the
+        inlist is left unchanged if any of them is invalid.
+
+        Args:
+            items (Mapping): {key: value} pairs to set.
+            **kwargs: Further key=value pairs.
+
+        Raises:
+            KeyError: If keys are not default MESA keys.
+            TypeError: If values are not compatible with their default type.
+            ValueError: If there are both key and type errors.
+        """
+        items = dict(items or {}, **kwargs)
+        checked = []
+        errors = []
+        for key, value in items.items():
+            try:
+                checked.append(self.checkItem(key, value))
+            except (KeyError, TypeError) as error:
+                errors.append(error)
+        if errors:
+            raise self.combineErrors(errors)
+
+        warnings = [item.warning for item in checked if item.warning]
+        if warnings and not self.suppressWarnings:
+            print("\n".join(warnings))
+
+        sections = {}
+        vectors = {}
+        for item in checked:
+            if item.section not in sections:
+                sections[item.section] = self.nml[item.section]
+            section = sections[item.section]
+            if item.isVector and item.vectorKey in section:
+                if self.assignItem(item, fillVector=False):
+                    vectors[item.vectorKey] = item
+            elif type(item.value) in scalarTypes:
+                # plain scalars need none of the conversions done by
+                # Namelist.__setitem__ and the key is already lower case
+                OrderedDict.__setitem__(section, item.key, item.value)
+                self.dirtyKeys[(item.section, item.key)] = None
+            else:
+                section[item.key] = item.value
+                self.dirtyKeys[(item.section, item.key)] = None
+        for item in vectors.values():
+            self.fillVector(item.section, item.vectorKey, item.default)
 
+    def checkItem(self, key: str, value: Any) -> CheckedItem:
+        key = self.formatKey(key)
         isVector, vectorKey, vectorIndex = self.checkVector(key)
-        if vectorKey not in self.default_keys:
-            raise KeyError(f"{vectorKey} is not a default MESA key.")
-
+        info = self.schema[vectorKey]
         if isVector:
-            defaultValue = self.fullDict[whichSection][vectorKey]
-            defaultValue = defaultValue[0]
-        else:
-            defaultValue = self.fullDict[whichSection][key]
-        defaultType = type(defaultValue)
-        valueType = type(value)
-        if not isinstance(value, defaultType):
-            if (isinstance(defaultValue, float) and isinstance(value, int)) or (
-                isinstance(defaultValue, int) and isinstance(value, float)
-            ):
-                msg = f"Warning: default type for {key} is {defaultType},"
-                msg = msg + f" but value is {valueType}"
-                if not self.suppressWarnings:
-                    print(msg)
-            else:
-                msg = f"default type for {key} is {defaultType},"
-                msg = msg + f" which is not compatible with type {valueType}"
-                raise TypeError(msg)
-
-        if isVector and vectorKey in section_keys:
-            with open(self.infile) as file:
-                nml_idcs = []
-                for line in file.readlines():
-                    if vectorKey in line:
-                        nml_idcs.append(self.checkVector(line)[-1])
-
-            idcs = range(min(nml_idcs), max(nml_idcs) + 1)
-            if vectorIndex not in idcs:
-                self.nml[whichSection][key] = value
+            self.schema.checkIndex(key, vectorKey, vectorIndex)
+        warning = self.schema.checkType(key, value, vectorKey=vectorKey)
+        return CheckedItem(
+            key,
+            value,
+            isVector,
+            vectorKey,
+            vectorIndex,
+            info.section,
+            info.default,
+            warning,
+        )
 
-            else:
-                loc = idcs.index(vectorIndex)
-                vals = self.nml[whichSection][vectorKey]
-                vals[loc] = value
-                for i in range(len(vals)):
-                    if not vals[i]:
-                        vals[i] = defaultValue
-                # alternative idea: expand vectors
-                # maybe do this in a pre-processing stage?
-                # for i in range(len(vals)):
-                #     newKey = vectorKey + "(" + str(idcs[i]) + ")"
-                #     self.nml[whichSection][newKey] = vals[i]
-                # del self.nml[whichSection][vectorKey]
-                self.nml[whichSection][vectorKey] = vals
+    def assignItem(
+        self, item: CheckedItem, fillVector: bool = True, nml: f90nml.Namelist = None
+    ) -> bool:
+        """Sets a validated item, returns whether it went into a vector.
+
+        Args:
+            item (CheckedItem): Item returned by checkItem.
+            fillVector (bool): Fill unset vector elements with the default.
+            nml (Namelist): Namelist to modify instead of the own one.
+        """
+        if nml is None:
+            nml = self.nml
+        dirty = self.dirtyKeys if nml is self.nml else {}
+        section = nml[item.section]
+        if item.isVector and item.vectorKey in section.keys():
+            idcs = self.getVectorRange(item.section, item.vectorKey)
+            if item.vectorIndex in idcs:
+                vals = section[item.vectorKey]
+                vals[idcs.index(item.vectorIndex)] = item.value
+                dirty[(item.section, item.vectorKey)] = None
+                if fillVector:
+                    self.fillVector(item.section, item.vectorKey, item.default, nml)
+                return True
+        section[item.key] = item.value
+        dirty[(item.section, item.key)] = None
+        return False
+
+    def fillVector(
+        self,
+        whichSection: str,
+        vectorKey: str,
+        defaultValue: Any,
+        nml: f90nml.Namelist = None,
+    ) -> None:
+        nml = self.nml if nml is None else nml
+        vals = nml[whichSection][vectorKey]
+        for i in range(len(vals)):
+            if not vals[i]:
+                vals[i] = defaultValue
+        nml[whichSection][vectorKey] = vals
 
+    @staticmethod
+    def combineErrors(errors: List[Exception]) -> Exception:
+        if len(errors) == 1:
+            return errors[0]
+        messages = [str(error.args[0]) if error.args else "" for error in errors]
+        msg = f"{len(errors)} invalid items:\n" + "\n".join(messages)
+        if all(isinstance(error, KeyError) for error in errors):
+            return KeyError(msg)
+        elif all(isinstance(error, TypeError) for error in errors):
+            return TypeError(msg)
         else:
-            self.nml[whichSection][key] = value
+            return ValueError(msg)
 
     def __delitem__(self, key: str) -> None:
         key = self.formatKey(key)
         whichSection = self.getSection(key)
 
         _, key, _ = self.checkVector(key)
-        if key not in self.default_keys:
-            raise KeyError(f"{key} is not a default MESA key.")
-
         section = self.nml[whichSection]
         section_keys = section.keys()
         if key in section_keys:
             del self.nml[whichSection][key]
+            self.dirtyKeys[(whichSection, key)] = None
         else:
             raise KeyError(key, "is not in the current inlist.")
 
@@ -172,109 +285,294 @@ class MesaAccess:
             print("Vectors are already expanded.")
             return
 
-        vectorKeys = []
-        with open(self.infile) as file:
-            for line in file.readlines():
-                line = line.strip()
-                isVector, vectorKey, vectorIndex = self.checkVector(line)
-                if isVector:
-                    vectorKeys.append(vectorKey)
-
-        vectorKeys = sorted(set(vectorKeys))
-        for vectorKey in vectorKeys:
-            try:
-                whichSection = self.getSection(vectorKey)
-            except KeyError:
-                vectorKey = self.formatKey(vectorKey)
-                whichSection = self.getSection(vectorKey)
-            nml_idcs = []
-            with open(self.infile) as file:
-                for line in file.readlines():
-                    if vectorKey in line:
-                        nml_idcs.append(self.checkVector(line)[-1])
-                idcs = range(min(nml_idcs), max(nml_idcs) + 1)
-                vals = self.nml[whichSection][vectorKey]
-                for i in range(len(vals)):
-                    if vals[i] is None:
-                        continue
-                    else:
-                        newKey = vectorKey + "(" + str(idcs[i]) + ")"
-                        self.nml[whichSection][newKey] = vals[i]
-            del self.nml[whichSection][vectorKey]
-
-    def writeFile(self) -> None:
-        with open(self.outfile, "w") as file:
-            self.nml.write(file)
+        for vectorKey in sorted(self.vectorTable.keys()):
+            whichSection = self.getSection(vectorKey)
+            section = self.nml[whichSection]
+            if vectorKey not in section:
+                continue
+            idcs = self.getVectorRange(whichSection, vectorKey)
+            vals = section[vectorKey]
+            for i in range(len(vals)):
+                if vals[i] is None:
+                    continue
+                else:
+                    newKey = vectorKey + "(" + str(idcs[i]) + ")"
+                    section[newKey] = vals[i]
+            del section[vectorKey]
+        self.inlistLayout = None
+
+    def getVectorRange(self, whichSection: str, vectorKey: str) -> range:
+        """Returns the index range of a vector in the source inlist.
+
+        Args:
+            whichSection (str): Section of the vector.
+            vectorKey (str): Name of the vector without index.
+
+        Returns:
+            idcs (range): Fortran indices covered by the vector.
+        """
+        positions = self.vectorTable.get(vectorKey)
+        if positions:
+            return range(min(positions), max(positions) + 1)
+        section = self.nml[whichSection]
+        start = section.start_index.get(vectorKey, [1])[0] or 1
+        return range(start, start + len(section[vectorKey]))
 
-    def getDefaults(self, whichDefaults: str) -> dict:
-        if self.useMesaenv:
-            defaultsDir = self.getDefaultsDir(mesaEnv, whichDefaults)
-            pickleDir = Path(__file__).parent / "defaults/"
-        else:
-            if not self.legacyInlist:
-                defaultsDir = Path(__file__).parent / "defaults/mesa-r15140/"
-                pickleDir = Path(__file__).parent / "defaults/mesa-r15140/"
+    @staticmethod
+    def scanVectors(lines: List[str]) -> Dict[str, Dict[int, int]]:
+        """Collects all indexed assignments of an inlist in a single pass.
+
+        Args:
+            lines (list): Lines of the inlist.
+
+        Returns:
+            vectorTable (dict): {key: {index: line number}} for every vector
+                element assigned in the inlist.
+        """
+        vectorTable = {}
+        for lineNumber, line in enumerate(lines):
+            if "(" not in line:
+                continue
+            line = line.split("!", 1)[0]
+            for match in assignmentRegex.finditer(line):
+                vectorKey = match.group(1).lower()
+                vectorIndex = int(match.group(2))
+                vectorTable.setdefault(vectorKey, {})[vectorIndex] = lineNumber
+        return vectorTable
+
+    def writeFile(self, preserveLayout: bool = False) -> None:
+        """Writes the inlist to outfile.
+
+        Args:
+            preserveLayout (bool): Only patch the changed keys into the text
+                of infile, keeping its comments and ordering. Falls back to
+                a full rewrite if the layout of infile is not supported.
+        """
+        lines = self.patchLines() if preserveLayout else None
+        with open(self.outfile, "w") as file:
+            if lines is None:
+                self.nml.write(file)
+            else:
+                file.writelines(lines)
+
+    def patchLines(self) -> Optional[List[str]]:
+        """Returns the lines of infile with all changed keys patched in.
+
+        Changed assignments are rewritten in place, deleted ones are
+        dropped and new keys are appended at the end of their section.
+
+        Returns:
+            lines (list): Patched lines, None if infile could not be mapped.
+        """
+        if self.inlistLayout is None:
+            self.inlistLayout = self.scanLayout(self.inlistLines) or ()
+        if not self.inlistLayout:
+            return None
+
+        known = {(section, owner) for _, section, owner in self.inlistLayout}
+        pending = OrderedDict()
+        for section, key in self.dirtyKeys:
+            if (section, key) not in known and key in self.nml.get(section, {}):
+                pending.setdefault(section, []).append(key)
+
+        lines = []
+        written = set()
+        indent = self.nml.indent
+        for line, (kind, section, owner) in zip(self.inlistLines, self.inlistLayout):
+            if kind == "assign":
+                indent = lineRegex.match(line).group(1)
+            elif kind == "close" and section in pending:
+                # append after the last non-blank line of the section
+                position = len(lines)
+                while position and not lines[position - 1].strip():
+                    position -= 1
+                new = [
+                    indent + row + "\n"
+                    for row in self.renderKeys(section, pending.pop(section))
+                ]
+                lines[position:position] = new
+                indent = self.nml.indent
+            elif kind == "open":
+                indent = self.nml.indent
+            if (section, owner) in self.dirtyKeys:
+                if kind == "assign" and (section, owner) not in written:
+                    written.add((section, owner))
+                    lines.extend(self.patchLine(line, section, owner))
+                continue
+            lines.append(line)
+
+        for section, keys in pending.items():
+            if lines and not lines[-1].endswith("\n"):
+                lines[-1] += "\n"
+            lines.append("\n&" + section + "\n")
+            lines.extend(
+                self.nml.indent + row + "\n" for row in self.renderKeys(section, keys)
+            )
+            lines.append("/\n")
+        return lines
+
+    def patchLine(self, line: str, section: str, key: str) -> List[str]:
+        """Rewrites the assignment of key on line, keeping its comment."""
+        rows = self.renderKeys(section, [key]) if key in self.nml[section] else []
+        if not rows:
+            return []
+        indent = lineRegex.match(line).group(1)
+        code, comment = splitComment(line.rstrip("\n"))
+        rows[-1] += code[len(code.rstrip()) :] + comment if comment else ""
+        return [indent + row + "\n" for row in rows]
+
+    def renderKeys(self, section: str, keys: List[str]) -> List[str]:
+        """Formats assignments like f90nml would, without indentation."""
+        group = f90nml.Namelist()
+        source = self.nml[section]
+        for key in keys:
+            group[key] = source[key]
+            if key in source.start_index:
+                group.start_index[key] = source.start_index[key]
+        nml = f90nml.Namelist({section: group})
+        nml.float_format = self.nml.float_format
+        buffer = io.StringIO()
+        nml.write(buffer)
+        indent = len(nml.indent)
+        return [row[indent:] for row in buffer.getvalue().splitlines()[1:-1]]
+
+    def scanLayout(self, lines: List[str]) -> Optional[List[Tuple[str, str, str]]]:
+        """Maps every line of an inlist to the namelist key it assigns.
+
+        Args:
+            lines (list): Lines of the inlist.
+
+        Returns:
+            layout (list): (kind, section, key) for every line, where kind
+                is "open", "close", "assign", "continue" or "other". None
+                if the inlist uses constructs that cannot be patched, such
+                as several assignments on one line.
+        """
+        layout = []
+        sections = set()
+        section = owner = None
+        for line in lines:
+            code = splitComment(line)[0].strip()
+            match = groupRegex.match(code)
+            if section is not None and (code.startswith("/") or code.lower() == "&end"):
+                layout.append(("close", section, None))
+                section = owner = None
+            elif match:
+                section = match.group(1).lower()
+                if section in sections or match.group(2).strip():
+                    return None
+                sections.add(section)
+                owner = None
+                layout.append(("open", section, None))
+            elif section is None or not code:
+                layout.append(("other", section, None))
+            elif lineRegex.match(code):
+                if len(keyRegex.findall(stringRegex.sub("''", code))) > 1:
+                    return None
+                if code.endswith("/"):
+                    return None
+                _, name, index = lineRegex.match(code).groups()
+                owner = name.lower()
+                index = index.strip() if index else ""
+                if self.expandedVectors and index.isdigit():
+                    owner = f"{owner}({int(index)})"
+                layout.append(("assign", section, owner))
             else:
-                defaultsDir = Path(__file__).parent / "defaults/mesa-r10108/"
-                pickleDir = Path(__file__).parent / "defaults/mesa-r10108/"
+                layout.append(("continue", section, owner))
+        return layout
+
+    def getEffectiveInlist(self) -> EffectiveInlist:
+        """Resolves the read_extra_*_inlist chains of the inlist.
+
+        The current values of this inlist are used as the top level. The
+        included inlists are parsed once per process and reused as long as
+        they are unchanged on disk.
 
-        tempDir = Path(__file__).parent / "defaults/"
-        if not os.path.isdir(tempDir):
-            os.mkdir(tempDir)
+        Returns:
+            effective (EffectiveInlist): Merged view of all inlists with the
+                file that set each key.
+        """
+        return resolveIncludes(self.infile, self.nml)
 
+    def variant(self, items: Mapping[str, Any] = None, **kwargs: Any):
+        """Returns a copy-on-write variant of this inlist.
+
+        Args:
+            items (Mapping): {key: value} pairs that differ from this inlist.
+            **kwargs: Further key=value pairs.
+
+        Returns:
+            variant (InlistVariant): Overlay sharing this inlist as its base.
+        """
+        from mesatools.grid import InlistVariant
+
+        return InlistVariant(self, items, **kwargs)
+
+    def getSharedDefaults(self, whichDefaults: str) -> Mapping:
+        """Returns the process-wide, read-only defaults of a section.
+
+        The defaults are only loaded by the first instance that asks for
+        them; later instances reuse the same view.
+
+        Args:
+            whichDefaults (str): Defaults section.
+
+        Returns:
+            defaults (Mapping): Read-only {section: {key: default}} mapping.
+        """
         if whichDefaults not in defaultsDict.keys():
             raise BaseException(whichDefaults, "is not a valid option")
 
+        version = self.getVersion()
+        src, loader = self.getDefaultsSource(whichDefaults, version)
+        key = DefaultsRegistry.makeKey(src, version, whichDefaults)
+        return defaultsRegistry.get(key, loader)
+
+    def getDefaultsSource(
+        self, whichDefaults: str, version: str
+    ) -> Tuple[str, Callable]:
+        defaultsDir = self.findDefaultsDir(whichDefaults)
         src = os.path.join(defaultsDir, defaultsDict[whichDefaults])
-        dst = os.path.join(tempDir, defaultsDict[whichDefaults])
-        pickleFile = os.path.join(pickleDir, defaultsDict[whichDefaults] + ".pkl")
-        defaults = ["&" + sectionDict[whichDefaults]]
+        loader = partial(
+            readDefaults,
+            whichDefaults,
+            defaultsDir,
+            version,
+            self.reloadDefaults,
+        )
+        return src, loader
 
-        if os.path.exists(pickleFile) and not self.reloadDefaults:
-            with open(pickleFile, "rb") as file:
-                nml = pickle.load(file)
+    def getVersion(self) -> str:
+        if self.useMesaenv:
+            mesaDir = os.environ.get(mesaEnv, "")
+            version = getMesaVersion(mesaDir)
+            return version if version is not None else mesaDir
+        elif self.legacyInlist:
+            return "mesa-r10108"
         else:
-            with open(src) as file:
-                for line in file.readlines():
-                    line = line.strip()
-                    if line.startswith("!") or not line:
-                        continue
-                    else:
-                        if "num_x_ctrls" in line:
-                            line = line.replace("num_x_ctrls", "10")
-                        defaults.append(line)
-            defaults.append("/")
-
-            with open(dst, "w") as file:
-                for item in defaults:
-                    file.write(f"{item}\n")
-
-            nml = f90nml.read(dst)
-            os.remove(dst)
+            return "mesa-r15140"
 
-            with open(pickleFile, "wb") as file:
-                pickle.dump(nml, file)
+    def findDefaultsDir(self, whichDefaults: str) -> str:
+        if self.useMesaenv:
+            defaultsDir = self.getDefaultsDir(mesaEnv, whichDefaults)
+        elif not self.legacyInlist:
+            defaultsDir = Path(__file__).parent / "defaults/mesa-r15140/"
+        else:
+            defaultsDir = Path(__file__).parent / "defaults/mesa-r10108/"
+        return defaultsDir
 
-        return nml
+    def getDefaults(self, whichDefaults: str) -> dict:
+        defaultsDir = self.findDefaultsDir(whichDefaults)
+        entry = readDefaultsEntry(
+            whichDefaults, defaultsDir, self.getVersion(), self.reloadDefaults
+        )
+        defaults = f90nml.Namelist(zip(entry["names"], entry["defaults"]))
+        defaults.start_index = dict(entry["starts"])
+        return f90nml.Namelist({entry["section"]: defaults})
 
     def getSection(self, key: str) -> str:
         _, key, _ = self.checkVector(key)
-        whichSection = None
-        if key in self.controls_keys:
-            whichSection = sectionControls
-        elif key in self.pgstar_keys:
-            whichSection = sectionPgStar
-        elif key in self.star_job_keys:
-            whichSection = sectionStarJob
-        elif not self.legacyInlist:
-            if key in self.eos_keys:
-                whichSection = sectionEos
-            elif key in self.kap_keys:
-                whichSection = sectionKap
-        if whichSection is None:
-            raise KeyError(f"{key} is not a default MESA key.")
-        else:
-            return whichSection
+        return self.schema.getSection(key)
 
     @staticmethod
     def formatKey(key: str) -> str:
@@ -306,8 +604,7 @@ class MesaAccess:
 
     @staticmethod
     def checkVector(key: str) -> Tuple[bool, str, int]:
-        regex = r"(\w*) (\( [0-9]+ \))"
-        match = re.search(regex, key, re.VERBOSE)
+        match = vectorRegex.search(key) if "(" in key else None
         if match:
             isVector = True
             vectorKey = match.group(1)
@@ -317,3 +614,34 @@ class MesaAccess:
             vectorKey = key
             vectorIndex = None
         return isVector, vectorKey, vectorIndex
+
+
+def readDefaultsEntry(
+    whichDefaults: str, defaultsDir: str, version: str, reloadDefaults: bool
+) -> CacheEntry:
+    if whichDefaults not in defaultsDict.keys():
+        raise BaseException(whichDefaults, "is not a valid option")
+
+    src = os.path.join(defaultsDir, defaultsDict[whichDefaults])
+    section = sectionDict[whichDefaults]
+    return loadSchemaCache(
+        src,
+        version,
+        section,
+        parse=partial(parseDefaults, src, section),
+        reload=reloadDefaults,
+    )
+
+
+def readDefaults(
+    whichDefaults: str, defaultsDir: str, version: str, reloadDefaults: bool
+) -> dict:
+    entry = readDefaultsEntry(whichDefaults, defaultsDir, version, reloadDefaults)
+    return {entry["section"]: dict(zip(entry["names"], entry["defaults"]))}
+
+
+def readBounds(
+    whichDefaults: str, defaultsDir: str, version: str, reloadDefaults: bool
+) -> dict:
+    entry = readDefaultsEntry(whichDefaults, defaultsDir, version, reloadDefaults)
+    return {name: tuple(bounds) for name, bounds in entry["bounds"].items()}
@@ -0,0 +1,122 @@
+import glob
+import hashlib
+import json
+import os
+import subprocess
+from typing import Optional
+
+from mesatools.cache import lockFile
+from mesatools.registry import getMesaVersion
+from mesatools.utils.definitions import mesaEnv
+from mesatools.utils.fileops import file_digest
+
+# files of a work directory that star is compiled from, not the objects,
+# modules and libraries ./mk writes next to the makefile
+build_files = (
+    "mk",
+    "make/makefile*",
+    "src/*.f90",
+    "src/*.f",
+    "src/*.inc",
+    "src/*.dek",
+)
+
+# environment variables that change the compiled star
+build_env_vars = (
+    mesaEnv,
+    "MESASDK_ROOT",
+    "MESASDK_VERSION",
+    "FC",
+    "FFLAGS",
+    "FCFLAGS",
+    "LDFLAGS",
+)
+
+build_stamp = ".mesatools_build.json"
+build_lock = ".mesatools_build.lock"
+
+
+def build_fingerprint(build_dir: str = ".") -> str:
+    """Hashes everything the star executable of a work directory depends on.
+
+    The fingerprint covers the sources and makefiles of the work directory,
+    the version of MESA and the compiler environment.
+
+    Args:
+        build_dir (str): Work directory star is built in.
+
+    Returns:
+        fingerprint (str): Hex digest.
+    """
+    digest = hashlib.sha256()
+    mesa_dir = os.environ.get(mesaEnv, "")
+    digest.update(f"version={getMesaVersion(mesa_dir)}\n".encode())
+    for name in build_env_vars:
+        digest.update(f"{name}={os.environ.get(name)}\n".encode())
+    for pattern in build_files:
+        for path in sorted(glob.glob(os.path.join(build_dir, pattern))):
+            if os.path.isfile(path):
+                name = os.path.relpath(path, build_dir)
+                digest.update(f"{name}={file_digest(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def star_stamp(star: str) -> Optional[list]:
+    try:
+        stat = os.stat(star)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def is_up_to_date(build_dir: str = ".", fingerprint: str = None) -> bool:
+    """Checks whether star was built by make from the current sources.
+
+    Args:
+        build_dir (str): Work directory star is built in.
+        fingerprint (str): Current fingerprint, computed if not given.
+
+    Returns:
+        up_to_date (bool): False if star is missing, was replaced since the
+            last build or any input of the build changed.
+    """
+    try:
+        with open(os.path.join(build_dir, build_stamp)) as file:
+            stamp = json.load(file)
+    except (OSError, ValueError):
+        return False
+    star = star_stamp(os.path.join(build_dir, "star"))
+    if star is None or stamp.get("star") != star:
+        return False
+    return stamp.get("fingerprint") == (fingerprint or build_fingerprint(build_dir))
+
+
+def build_star(build_dir: str = ".", force: bool = False) -> bool:
+    """Runs ./mk in a work directory, unless star is up to date.
+
+    Concurrent calls for the same directory wait for each other, so a star
+    shared by several runs is only built once.
+
+    Args:
+        build_dir (str): Work directory star is built in.
+        force (bool): Build even if star is up to date.
+
+    Returns:
+        built (bool): Whether ./mk was run.
+    """
+    with lockFile(os.path.join(build_dir, build_lock)):
+        fingerprint = build_fingerprint(build_dir)
+        if not force and is_up_to_date(build_dir, fingerprint):
+            print("star is up to date in", build_dir)
+            return False
+
+        print("Building star")
+        returncode = subprocess.call("./mk", cwd=build_dir)
+        star = star_stamp(os.path.join(build_dir, "star"))
+        stamp_file = os.path.join(build_dir, build_stamp)
+        if returncode == 0 and star is not None:
+            with open(stamp_file, "w") as file:
+                json.dump({"fingerprint": fingerprint, "star": star}, file)
+        elif os.path.isfile(stamp_file):
+            os.remove(stamp_file)
+        return True
@@ -0,0 +1,157 @@
+import hashlib
+import mmap
+import os
+import pickle
+import tempfile
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on windows
+    fcntl = None
+
+from mesatools.utils.definitions import cacheEnv, cacheFormat
+
+# a cache entry is a plain dict of builtins, so loading it never needs f90nml:
+# {"format": int, "version": str, "section": str,
+#  "names": [str, ...], "defaults": [Any, ...], "starts": {name: [int, ...]},
+#  "bounds": {name: [first, last or None]}}
+CacheEntry = Dict[str, Any]
+
+
+def getCacheDir() -> str:
+    """Returns the per-user cache directory of mesatools.
+
+    The location can be changed with the MESATOOLS_CACHE_DIR environment
+    variable and otherwise follows XDG_CACHE_HOME (~/.cache by default).
+    """
+    cacheDir = os.environ.get(cacheEnv)
+    if not cacheDir:
+        xdgCache = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        cacheDir = os.path.join(xdgCache, "mesatools")
+    return cacheDir
+
+
+def getCachePath(src: str, version: str, section: str) -> str:
+    """Returns the cache file of a .defaults file.
+
+    The name is derived from the content of the source file, the MESA
+    version and the cache format, so any change to either of them results
+    in a new cache entry.
+
+    Args:
+        src (str): Path to the .defaults file.
+        version (str): MESA version the file belongs to.
+        section (str): Defaults section.
+
+    Returns:
+        path (str): Path of the cache file.
+    """
+    digest = hashlib.sha256()
+    with open(src, "rb") as file:
+        digest.update(file.read())
+    digest.update(f"{version}\0{section}\0{cacheFormat}".encode())
+    name = f"{section}-{digest.hexdigest()[:32]}.schema"
+    return os.path.join(getCacheDir(), name)
+
+
+def readEntry(path: str) -> Optional[CacheEntry]:
+    """Reads a cache entry, returning None if it is missing or unusable."""
+    try:
+        with open(path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                entry = pickle.loads(buffer)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+    if not isinstance(entry, dict) or entry.get("format") != cacheFormat:
+        return None
+    return entry
+
+
+def writeEntry(path: str, entry: CacheEntry) -> None:
+    """Atomically writes a cache entry.
+
+    The entry is written to a temporary file in the cache directory and
+    then renamed, so readers never see a partially written file.
+    """
+    cacheDir = os.path.dirname(path)
+    os.makedirs(cacheDir, exist_ok=True)
+    fd, tmpPath = tempfile.mkstemp(dir=cacheDir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+@contextmanager
+def lockFile(path: str) -> Iterator[None]:
+    """Holds an exclusive lock on path for the duration of the context."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as file:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def loadSchemaCache(
+    src: str,
+    version: str,
+    section: str,
+    parse: Callable[[], CacheEntry],
+    reload: bool = False,
+) -> CacheEntry:
+    """Loads the cached schema of a .defaults file, parsing it on a miss.
+
+    Concurrent processes that miss the cache at the same time wait for the
+    first one to finish parsing instead of all parsing the same file. If
+    the cache directory cannot be written, the file is parsed in memory.
+
+    Args:
+        src (str): Path to the .defaults file.
+        version (str): MESA version the file belongs to.
+        section (str): Defaults section.
+        parse (Callable): Builds the cache entry from src.
+        reload (bool): Ignore and replace an existing entry.
+
+    Returns:
+        entry (dict): Cache entry of the defaults file.
+    """
+    path = getCachePath(src, version, section)
+    entry = None if reload else readEntry(path)
+    if entry is not None:
+        return entry
+
+    def build() -> CacheEntry:
+        entry = parse()
+        entry["format"] = cacheFormat
+        entry["version"] = version
+        entry["section"] = section
+        return entry
+
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(lockFile(path + ".lock"))
+        except OSError:
+            # the cache directory is not writable, e.g. a read-only home
+            # directory on compute nodes, so the file is parsed every time
+            return build()
+        entry = None if reload else readEntry(path)
+        if entry is None:
+            entry = build()
+            try:
+                writeEntry(path, entry)
+            except OSError:
+                pass
+    return entry
@@ -0,0 +1,226 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Sequence, Set, Union
+
+from mesatools.utils.fileops import is_sidecar, sidecar_suffixes
+
+
+def clean_run_dirs(
+    work_dirs: Union[str, Sequence[str]],
+    keep_png: bool = False,
+    keep_logs: bool = False,
+    keep_photos: bool = True,
+    keep_last_photos: int = None,
+    profile_stride: int = None,
+    keep_newer: float = None,
+    threads: int = None,
+    profile_prefix: str = "profile",
+    profiles_index: str = "profiles.index",
+) -> int:
+    """Removes the output of runs from one or several run directories.
+
+    The directories are scanned with os.scandir and the files are removed
+    in batches, spread over several threads if requested. The read_data
+    sidecars of removed logs are removed with them.
+
+    Args:
+        work_dirs (str or list): Run directory or run directories.
+        keep_png (bool): Store/delete the png directory.
+        keep_logs (bool): Store/delete the logs directory.
+        keep_photos (bool): Store/delete the photo directory.
+        keep_last_photos (int): Number of most recent photos to keep. The
+            older photos are removed, even if keep_photos is set.
+        profile_stride (int): Keep every k-th profile, the last profile,
+            the history and the profile index, which is rewritten to list
+            only the remaining profiles.
+        keep_newer (float): Keep files modified less than this many seconds
+            ago.
+        threads (int): Threads scanning directories and removing files.
+        profile_prefix (str): profile_data_prefix of the runs.
+        profiles_index (str): profiles_index_name of the runs.
+
+    Returns:
+        removed (int): Number of files removed.
+    """
+    if isinstance(work_dirs, str):
+        work_dirs = [work_dirs]
+    cutoff = time.time() - keep_newer if keep_newer is not None else None
+
+    def scan(work_dir: str) -> List[str]:
+        files = []
+        if not keep_png:
+            files += select_png(os.path.join(work_dir, "png"), cutoff)
+        if not keep_logs:
+            files += select_logs(
+                os.path.join(work_dir, "LOGS"),
+                profile_stride,
+                cutoff,
+                profile_prefix,
+                profiles_index,
+            )
+        if not keep_photos or keep_last_photos:
+            files += select_photos(
+                os.path.join(work_dir, "photos"), keep_last_photos, cutoff
+            )
+        return files
+
+    if threads is not None and threads > 1 and len(work_dirs) > 1:
+        with ThreadPoolExecutor(threads) as executor:
+            files = [name for names in executor.map(scan, work_dirs) for name in names]
+    else:
+        files = [name for work_dir in work_dirs for name in scan(work_dir)]
+    return remove_files(files, threads)
+
+
+def scan_files(dir_name: str, cutoff: float = None) -> List[os.DirEntry]:
+    """Lists the files in a directory that are older than cutoff."""
+    if not os.path.isdir(dir_name):
+        return []
+    with os.scandir(dir_name) as entries:
+        return [
+            entry
+            for entry in entries
+            if entry.is_file(follow_symlinks=False)
+            and (cutoff is None or entry.stat(follow_symlinks=False).st_mtime < cutoff)
+        ]
+
+
+def select_png(dir_name: str, cutoff: float = None) -> List[str]:
+    return [
+        entry.path
+        for entry in scan_files(dir_name, cutoff)
+        if entry.name.endswith(".png")
+    ]
+
+
+def select_photos(
+    dir_name: str, keep_last: int = None, cutoff: float = None
+) -> List[str]:
+    entries = scan_files(dir_name)
+    if keep_last:
+        entries.sort(key=lambda entry: entry.stat(follow_symlinks=False).st_mtime)
+        entries = entries[:-keep_last]
+    return [
+        entry.path
+        for entry in entries
+        if cutoff is None or entry.stat(follow_symlinks=False).st_mtime < cutoff
+    ]
+
+
+def select_logs(
+    dir_name: str,
+    profile_stride: int = None,
+    cutoff: float = None,
+    profile_prefix: str = "profile",
+    profiles_index: str = "profiles.index",
+) -> List[str]:
+    entries = scan_files(dir_name, cutoff)
+    if not profile_stride:
+        return [
+            entry.path
+            for entry in entries
+            if entry.name.endswith(".data")
+            or entry.name.endswith(".index")
+            or is_sidecar(entry.name)
+        ]
+
+    # only the profiles listed in the index, so histories of the same
+    # prefix, e.g. history_2.data, are never mistaken for profiles
+    index_file = os.path.join(dir_name, profiles_index)
+    numbers = read_profile_numbers(index_file)
+    if not numbers:
+        return []
+    last = max(numbers)
+    candidates = {}
+    for number in numbers:
+        if (number - 1) % profile_stride and number != last:
+            name = f"{profile_prefix}{number}.data"
+            candidates[name] = number
+            for suffix in sidecar_suffixes:
+                candidates[name + suffix] = number
+
+    files = []
+    removed: Set[int] = set()
+    for entry in entries:
+        number = candidates.get(entry.name)
+        if number is not None:
+            files.append(entry.path)
+            if not is_sidecar(entry.name):
+                removed.add(number)
+    if removed:
+        rewrite_profile_index(index_file, removed)
+    return files
+
+
+def read_profile_numbers(file_name: str) -> List[int]:
+    """Returns the profile numbers listed in a profile index, [] if missing."""
+    try:
+        with open(file_name) as file:
+            lines = file.readlines()[1:]
+    except FileNotFoundError:
+        return []
+    return [
+        int(values[2])
+        for values in map(str.split, lines)
+        if len(values) == 3 and values[2].isdigit()
+    ]
+
+
+def rewrite_profile_index(file_name: str, removed: Set[int]) -> None:
+    """Drops the entries of removed profiles from a profile index.
+
+    Args:
+        file_name (str): Profile index, with a header line followed by
+            model number, priority and profile number on every line.
+        removed (set): Numbers of the removed profiles.
+    """
+    with open(file_name) as file:
+        header, *lines = file.readlines()
+    kept = []
+    for line in lines:
+        values = line.split()
+        if len(values) == 3 and values[2].isdigit() and int(values[2]) in removed:
+            continue
+        kept.append(line)
+    if len(kept) == len(lines):
+        return
+    header = re.sub(r"^(\s*)\d+", lambda m: f"{m.group(1)}{len(kept)}", header, 1)
+    tmp_name = file_name + ".tmp"
+    with open(tmp_name, "w") as file:
+        file.write(header)
+        file.writelines(kept)
+    os.replace(tmp_name, file_name)
+
+
+def remove_files(
+    files: Iterable[str], threads: int = None, batch_size: int = 1000
+) -> int:
+    """Removes files in batches, in parallel if threads is above one.
+
+    Args:
+        files (Iterable): Files to remove. Missing files are ignored.
+        threads (int): Number of threads.
+        batch_size (int): Files removed per task.
+
+    Returns:
+        removed (int): Number of files removed.
+    """
+    files = list(files)
+    batches = [files[i : i + batch_size] for i in range(0, len(files), batch_size)]
+    if threads is None or threads <= 1 or len(batches) <= 1:
+        return sum(map(remove_batch, batches))
+    with ThreadPoolExecutor(threads) as executor:
+        return sum(executor.map(remove_batch, batches))
+
+
+def remove_batch(files: Sequence[str]) -> int:
+    removed = 0
+    for name in files:
+        try:
+            os.remove(name)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
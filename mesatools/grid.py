@@ -0,0 +1,194 @@
+import itertools
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple, Union
+
+import f90nml
+
+from mesatools.access import CheckedItem, MesaAccess
+
+
+class InlistVariant:
+    """Copy-on-write variant of a parsed inlist.
+
+    Only the keys that differ from the base inlist are stored. The base is
+    shared between all variants and never modified; reading a key that was
+    not changed falls through to the base.
+
+    Args:
+        base (MesaAccess): Parsed base inlist.
+        items (Mapping): {key: value} pairs that differ from the base.
+        **kwargs: Further key=value pairs.
+    """
+
+    def __init__(
+        self, base: MesaAccess, items: Mapping[str, Any] = None, **kwargs: Any
+    ) -> None:
+        self.base = base
+        self.overlay: Dict[str, CheckedItem] = OrderedDict()
+        self.update(items, **kwargs)
+
+    def __getitem__(self, key: str) -> Any:
+        key = self.base.formatKey(key)
+        if key in self.overlay:
+            return self.overlay[key].value
+        return self.base[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.update({key: value})
+
+    def __delitem__(self, key: str) -> None:
+        del self.overlay[self.base.formatKey(key)]
+
+    def __len__(self) -> int:
+        return len(self.overlay)
+
+    def update(self, items: Mapping[str, Any] = None, **kwargs: Any) -> None:
+        """Validates and stores several changed keys, see MesaAccess.apply."""
+        items = dict(items or {}, **kwargs)
+        checked = []
+        errors = []
+        for key, value in items.items():
+            try:
+                checked.append(self.base.checkItem(key, value))
+            except (KeyError, TypeError) as error:
+                errors.append(error)
+        if errors:
+            raise self.base.combineErrors(errors)
+
+        for item in checked:
+            if item.warning and not self.base.suppressWarnings:
+                print(item.warning)
+            self.overlay[item.key] = item
+
+    def toNamelist(self) -> f90nml.Namelist:
+        """Builds the namelist of the variant.
+
+        Sections without changes are shared with the base, the others are
+        shallow copies with the changed keys applied.
+        """
+        nml = f90nml.Namelist()
+        nml.float_format = self.base.nml.float_format
+        touched = {item.section for item in self.overlay.values()}
+        for name, section in self.base.nml.items():
+            nml[name] = copySection(section) if name in touched else section
+        for name in touched:
+            if name not in nml:
+                nml[name] = f90nml.Namelist()
+
+        vectors = {}
+        for item in self.overlay.values():
+            section = nml[item.section]
+            if item.isVector and item.vectorKey in section:
+                if item.vectorKey not in vectors:
+                    # vector values are lists, copy them before the first write
+                    section[item.vectorKey] = list(section[item.vectorKey])
+                    vectors[item.vectorKey] = item
+            self.base.assignItem(item, fillVector=False, nml=nml)
+        for item in vectors.values():
+            self.base.fillVector(item.section, item.vectorKey, item.default, nml)
+        return nml
+
+    def writeFile(self, outfile: str) -> None:
+        with open(outfile, "w") as file:
+            self.toNamelist().write(file)
+
+
+def copySection(section: f90nml.Namelist) -> f90nml.Namelist:
+    """Shallow copy of a namelist section that keeps its start indices."""
+    copy = f90nml.Namelist()
+    for key, value in section.items():
+        OrderedDict.__setitem__(copy, key, value)
+    copy.start_index = dict(section.start_index)
+    return copy
+
+
+def gridPoints(
+    values: Mapping[str, Sequence[Any]], mode: str = "product"
+) -> List[Dict[str, Any]]:
+    """Expands per-key value arrays into a list of grid points.
+
+    Args:
+        values (Mapping): {key: values} for every varied key.
+        mode (str): "product" for the cartesian product of all values or
+            "zip" to combine the i-th values of every key.
+
+    Returns:
+        points (list): {key: value} for every grid point.
+    """
+    keys = list(values.keys())
+    if mode == "product":
+        combinations = itertools.product(*values.values())
+    elif mode == "zip":
+        lengths = {len(v) for v in values.values()}
+        if len(lengths) > 1:
+            raise ValueError("all value arrays must have the same length for zip")
+        combinations = zip(*values.values())
+    else:
+        raise ValueError(f"{mode} is not a valid option, use product or zip")
+    return [dict(zip(keys, combination)) for combination in combinations]
+
+
+def makeGrid(
+    infile: str,
+    values: Mapping[str, Sequence[Any]],
+    outfile: Union[str, Callable[[int, Dict[str, Any]], str]] = "inlist_{index}",
+    mode: str = "product",
+    processes: int = 1,
+    common: Mapping[str, Any] = None,
+    **kwargs: Any,
+) -> List[str]:
+    """Writes one inlist per grid point.
+
+    The base inlist is parsed once per process and every grid point is
+    written as a copy-on-write variant of it.
+
+    Args:
+        infile (str): Base inlist.
+        values (Mapping): {key: values} for every varied key.
+        outfile (str or Callable): Output name, either a format string
+            with an {index} field or a function of (index, point).
+        mode (str): "product" or "zip", see gridPoints.
+        processes (int): Number of worker processes.
+        common (Mapping): {key: value} applied to every grid point.
+        **kwargs: Arguments passed on to MesaAccess.
+
+    Returns:
+        outfiles (list): Names of the written inlists, in grid order.
+    """
+    points = gridPoints(values, mode)
+    if isinstance(outfile, str):
+        pattern = outfile
+        outfiles = [pattern.format(index=i) for i in range(len(points))]
+    else:
+        outfiles = [outfile(i, point) for i, point in enumerate(points)]
+    common = dict(common or {})
+    jobs = [(name, {**common, **point}) for name, point in zip(outfiles, points)]
+
+    processes = max(1, min(processes or os.cpu_count() or 1, len(jobs)))
+    if processes == 1:
+        initGridWorker(infile, kwargs)
+        writeGridChunk(jobs)
+    else:
+        chunks = [jobs[i::processes] for i in range(processes)]
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=initGridWorker,
+            initargs=(infile, kwargs),
+        ) as executor:
+            list(executor.map(writeGridChunk, chunks))
+    return outfiles
+
+
+_gridBase: MesaAccess = None
+
+
+def initGridWorker(infile: str, kwargs: Mapping[str, Any]) -> None:
+    global _gridBase
+    _gridBase = MesaAccess(infile=infile, outfile=infile, **kwargs)
+
+
+def writeGridChunk(jobs: Sequence[Tuple[str, Mapping[str, Any]]]) -> None:
+    for outfile, items in jobs:
+        InlistVariant(_gridBase, items).writeFile(outfile)
@@ -0,0 +1,217 @@
+import os
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Hashable, Iterator, List, Mapping, Tuple
+
+import f90nml
+
+from mesatools.utils.definitions import maxExtraInlists, maxInlistLevel
+
+
+class IncludeCache:
+    """Process-wide cache of parsed include inlists.
+
+    Included inlists are usually shared between many runs, so each file is
+    only parsed once per process. Entries are checked against the
+    modification time and size of the file and reparsed when it changes.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[Hashable, Mapping]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str) -> Mapping[str, Mapping[str, Any]]:
+        """Returns the flattened sections of an inlist, parsing it if necessary.
+
+        Args:
+            path (str): Path to the inlist.
+
+        Returns:
+            view (Mapping): Read-only {section: {key: value}} mapping, see
+                flattenSection.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != stamp:
+            nml = f90nml.read(path)
+            view = {
+                section.lower(): MappingProxyType(flattenSection(group))
+                for section, group in nml.items()
+            }
+            entry = self._entries[path] = (stamp, MappingProxyType(view))
+        return entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class EffectiveInlist(Mapping):
+    """Merged view of an inlist and all inlists it includes.
+
+    Keys are lower case and vector elements are addressed as name(index),
+    like in an inlist with expanded vectors. Later reads override earlier
+    ones, in the order MESA reads the files.
+
+    Attributes:
+        sections (dict): {section: {key: value}} of the merged inlists.
+        sources (dict): {section: {key: path}} of the file that set each key.
+        files (list): (section, path) for every file read, in read order.
+    """
+
+    def __init__(self) -> None:
+        self.sections: Dict[str, Dict[str, Any]] = OrderedDict()
+        self.sources: Dict[str, Dict[str, str]] = OrderedDict()
+        self.files: List[Tuple[str, str]] = []
+
+    def __getitem__(self, key: str) -> Any:
+        return self.sections[self.getSection(key)][key.lower()]
+
+    def __iter__(self) -> Iterator[str]:
+        for values in self.sections.values():
+            yield from values
+
+    def __len__(self) -> int:
+        return sum(len(values) for values in self.sections.values())
+
+    def getSection(self, key: str) -> str:
+        key = key.lower()
+        for section, values in self.sections.items():
+            if key in values:
+                return section
+        raise KeyError(f"{key} is not set in the inlist or its includes.")
+
+    def getSource(self, key: str) -> str:
+        """Returns the path of the inlist that set key last."""
+        return self.sources[self.getSection(key)][key.lower()]
+
+
+def flattenSection(group: Any) -> Dict[str, Any]:
+    """Flattens a namelist group into {key: value} with one key per element.
+
+    Vectors are split into name(index) keys and unset elements are left
+    out, so merging two flattened groups behaves like reading both
+    namelists in turn. Arrays of higher rank are kept as a whole.
+
+    Args:
+        group (Namelist): Namelist group, or a list of them if the group
+            appears several times in a file.
+
+    Returns:
+        flat (dict): {key: value} in order of appearance.
+    """
+    flat = OrderedDict()
+    for nml in group if isinstance(group, list) else [group]:
+        for key, value in nml.items():
+            if not isinstance(value, list) or any(isinstance(v, list) for v in value):
+                flat[key] = value
+                continue
+            start = (nml.start_index.get(key) or [1])[0] or 1
+            for i, v in enumerate(value):
+                if v is not None:
+                    flat[f"{key}({start + i})"] = v
+    return flat
+
+
+def extraInlists(section: str, flat: Mapping[str, Any]) -> List[str]:
+    """Returns the names of the inlists a group asks MESA to read next.
+
+    Both the read_extra_<section>_inlist1 and read_extra_<section>_inlist(1)
+    forms are supported.
+    """
+    names = []
+    for i in range(1, maxExtraInlists + 1):
+        for flag, name in (
+            (f"read_extra_{section}_inlist{i}", f"extra_{section}_inlist{i}_name"),
+            (f"read_extra_{section}_inlist({i})", f"extra_{section}_inlist_name({i})"),
+        ):
+            if flat.get(flag) is True and name in flat:
+                names.append(flat[name])
+                break
+    return names
+
+
+def resolveIncludes(
+    path: str,
+    nml: Mapping[str, Any],
+    baseDir: str = None,
+    cache: IncludeCache = None,
+) -> EffectiveInlist:
+    """Resolves the read_extra_*_inlist chains of an inlist.
+
+    Like MESA, every section follows its own chain: a file is read, then the
+    extra inlists it enables, depth first, each overriding what was read
+    before.
+
+    Args:
+        path (str): Path to the top-level inlist.
+        nml (Namelist): Parsed top-level inlist.
+        baseDir (str): Directory relative include names are resolved
+            against, the directory of path by default (MESA's work dir).
+        cache (IncludeCache): Cache of parsed includes, includeCache by
+            default.
+
+    Returns:
+        effective (EffectiveInlist): Merged view with per-key provenance.
+
+    Raises:
+        KeyError: If an included inlist lacks the section including it.
+        ValueError: If the includes are cyclic or nested too deeply.
+    """
+    path = os.path.abspath(path)
+    baseDir = os.path.dirname(path) if baseDir is None else baseDir
+    cache = includeCache if cache is None else cache
+    effective = EffectiveInlist()
+    for section, group in nml.items():
+        section = section.lower()
+        flat = flattenSection(group)
+        mergeSection(effective, section, path, flat, baseDir, cache, (path,))
+    return effective
+
+
+def mergeSection(
+    effective: EffectiveInlist,
+    section: str,
+    path: str,
+    flat: Mapping[str, Any],
+    baseDir: str,
+    cache: IncludeCache,
+    chain: Tuple[str, ...],
+) -> None:
+    if len(chain) > maxInlistLevel:
+        raise ValueError(f"too many levels of nested {section} inlists in {path}")
+
+    values = effective.sections.setdefault(section, OrderedDict())
+    sources = effective.sources.setdefault(section, OrderedDict())
+    for key, value in flat.items():
+        values[key] = value
+        sources[key] = path
+    effective.files.append((section, path))
+
+    for name in extraInlists(section, flat):
+        extraPath = os.path.abspath(os.path.join(baseDir, name))
+        if extraPath in chain:
+            raise ValueError(f"{extraPath} includes itself through &{section}")
+        extra = cache.get(extraPath)
+        if section not in extra:
+            raise KeyError(f"{extraPath} has no &{section} namelist.")
+        mergeSection(
+            effective,
+            section,
+            extraPath,
+            extra[section],
+            baseDir,
+            cache,
+            chain + (extraPath,),
+        )
+
+
+includeCache = IncludeCache()
+
+
+def clearIncludes() -> None:
+    """Drops all cached include inlists of this process."""
+    includeCache.clear()
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Mapping
 
 from mesatools.access import MesaAccess
 
@@ -13,10 +13,6 @@ class MesaInlist:
         reloadDefaults (bool): Reload default inlist files.
         useMesaenv (bool): Use MESA_ENV environment variable.
         legacyInlist (bool): Legacy inlist (before mesa-r15140).
-
-    Attributes:
-
-    To-do: Change this to work with setting 'extra_star_job_inlist1_name
     """
 
     def __init__(
@@ -48,6 +44,12 @@ class MesaInlist:
     def __delitem__(self, key: str) -> None:
         self.inlist.__delitem__(key=key)
 
+    def update(self, items: Mapping[str, Any] = None, **kwargs: Any) -> None:
+        self.inlist.apply(items, **kwargs)
+
+    def getEffectiveInlist(self):
+        return self.inlist.getEffectiveInlist()
+
     def items(self):
         return self.inlist.items()
 
@@ -57,5 +59,5 @@ class MesaInlist:
     def values(self):
         return self.inlist.values()
 
-    def writeInlist(self) -> None:
-        self.inlist.writeFile()
+    def writeInlist(self, preserveLayout: bool = False) -> None:
+        self.inlist.writeFile(preserveLayout=preserveLayout)
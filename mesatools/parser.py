@@ -0,0 +1,217 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from mesatools.cache import CacheEntry
+
+# name, optional index expression and value of an assignment
+assignmentRegex = re.compile(r"^\s*([A-Za-z]\w*)\s*(?:\(([^)]*)\))?\s*=(.*)$")
+intRegex = re.compile(r"^[+-]?\d+$")
+floatRegex = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eEdDqQ][+-]?\d+)?$")
+floatTable = str.maketrans("dDqQ", "eeee")
+
+# dimensions used in the .defaults files instead of literal bounds
+dimensionDict = {"num_x_ctrls": "10"}
+
+
+def parseDefaults(src: str, section: str) -> CacheEntry:
+    """Parses a MESA .defaults file directly into a schema cache entry.
+
+    The .defaults files only contain one assignment per line, so they can
+    be streamed line by line instead of going through a general namelist
+    parser. The result matches what f90nml produces for the same file.
+
+    Args:
+        src (str): Path to the .defaults file.
+        section (str): Defaults section.
+
+    Returns:
+        entry (dict): Cache entry with names, defaults, start indices and
+            the bounds of one-dimensional vectors.
+    """
+    scalars: Dict[str, Any] = {}
+    arrays: Dict[str, Dict[Tuple[int, ...], Any]] = {}
+    fills: Dict[str, Tuple[int, Any]] = {}
+    stops: Dict[str, int] = {}
+    order: Dict[str, None] = {}
+
+    with open(src) as file:
+        for line in file:
+            stripped = line.lstrip()
+            if not stripped or stripped[0] == "!":
+                continue
+            match = assignmentRegex.match(line)
+            if match is None:
+                continue
+
+            name, index, value = match.groups()
+            name = name.lower()
+            order[name] = None
+            value = parseValue(stripComment(value))
+            if index is None:
+                scalars[name] = value
+                continue
+
+            # like f90nml, an open range assigns to the first element of an
+            # existing array and is replaced by later indexed assignments
+            indices = parseIndex(index)
+            stop = parseStop(index)
+            if stop is not None:
+                stops[name] = max(stop, stops.get(name, stop))
+            if None not in indices:
+                fills.pop(name, None)
+                arrays.setdefault(name, {})[indices] = value
+            elif name in arrays:
+                array = arrays[name]
+                first = tuple(min(i[d] for i in array) for d in range(len(indices)))
+                array[first] = value
+            else:
+                fills[name] = (len(indices), value)
+
+    names = list(order)
+    defaults = []
+    starts = {}
+    bounds = {}
+    for name in names:
+        if name in arrays:
+            default, start = buildArray(arrays[name])
+            starts[name] = start
+        elif name in fills:
+            rank, fill = fills[name]
+            default = [fill]
+            for _ in range(rank - 1):
+                default = [default]
+            starts[name] = [None] * rank
+        else:
+            default = scalars[name]
+        defaults.append(default)
+        if name in starts and len(starts[name]) == 1:
+            bounds[name] = vectorBounds(starts[name][0], len(default), stops.get(name))
+
+    return {
+        "names": names,
+        "defaults": defaults,
+        "starts": starts,
+        "bounds": bounds,
+    }
+
+
+def vectorBounds(
+    start: Optional[int], size: int, stop: Optional[int]
+) -> List[Optional[int]]:
+    """Returns the first and last valid index of a vector.
+
+    MESA declares all vectors from 1, the defaults may only assign to later
+    elements. The last index is only known if the defaults assign to a
+    range that ends at it, e.g. x_ctrl(1:num_x_ctrls), and None otherwise.
+    """
+    if start is None:
+        return [1, stop]
+    if stop is not None:
+        stop = max(stop, start + size - 1)
+    return [min(start, 1), stop]
+
+
+def parseIndex(index: str) -> Tuple[Optional[int], ...]:
+    """Converts a fortran index expression into a tuple of start indices.
+
+    Ranges only keep their lower bound, since the .defaults files assign a
+    single value to them. Open ranges such as (:) give None.
+    """
+    indices = []
+    for item in index.split(","):
+        item = item.strip()
+        for dimension, size in dimensionDict.items():
+            item = item.replace(dimension, size)
+        lower = item.split(":", 1)[0].strip()
+        indices.append(int(lower) if lower else None)
+    return tuple(indices)
+
+
+def parseStop(index: str) -> Optional[int]:
+    """Returns the upper bound of a one-dimensional range such as (1:10)."""
+    if "," in index or ":" not in index:
+        return None
+    _, _, upper = index.partition(":")
+    upper = upper.strip()
+    for dimension, size in dimensionDict.items():
+        upper = upper.replace(dimension, size)
+    return int(upper) if intRegex.match(upper) else None
+
+
+def buildArray(
+    values: Dict[Tuple[int, ...], Any],
+) -> Tuple[List[Any], List[Optional[int]]]:
+    """Builds the (nested) list of an array from its assigned elements.
+
+    Gaps are filled with None. For two-dimensional arrays the outer list
+    runs over the second index, like f90nml does.
+    """
+    rank = len(next(iter(values)))
+    start = [min(index[i] for index in values) for i in range(rank)]
+    if rank == 1:
+        stop = max(index[0] for index in values)
+        array = [None] * (stop - start[0] + 1)
+        for (i,), value in values.items():
+            array[i - start[0]] = value
+        return array, start
+
+    stop = max(index[1] for index in values)
+    array = []
+    for j in range(start[1], stop + 1):
+        row = {i: value for (i, jj), value in values.items() if jj == j}
+        if not row:
+            array.append([None])
+            continue
+        column = [None] * (max(row) - start[0] + 1)
+        for i, value in row.items():
+            column[i - start[0]] = value
+        array.append(column)
+    return array, start
+
+
+def stripComment(value: str) -> str:
+    """Removes a trailing comment and separators from a value string."""
+    quote = None
+    for i, char in enumerate(value):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "!":
+            value = value[:i]
+            break
+    return value.strip().rstrip(",").strip()
+
+
+def splitComment(line: str) -> Tuple[str, str]:
+    """Splits a line into its code and its trailing comment (with the "!")."""
+    quote = None
+    for i, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "!":
+            return line[:i], line[i:]
+    return line, ""
+
+
+def parseValue(value: str) -> Any:
+    """Converts a fortran literal into the corresponding python value."""
+    if not value:
+        return None
+    if value[0] in "'\"":
+        quote = value[0]
+        return value[1:-1].replace(quote * 2, quote)
+    if intRegex.match(value):
+        return int(value)
+    if floatRegex.match(value):
+        return float(value.translate(floatTable))
+    lower = value.lower()
+    if lower.lstrip(".").startswith("t"):
+        return True
+    if lower.lstrip(".").startswith("f"):
+        return False
+    raise ValueError(f"could not parse {value} in defaults file")
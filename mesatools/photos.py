@@ -0,0 +1,91 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# MESA names photos after the last photo_digits digits of the model number,
+# with an x in front in older versions
+photo_regex = re.compile(r"^x?(\d+)$")
+
+
+class PhotoIndex:
+    """Photos of a run in the order they were written.
+
+    The names only contain the last photo_digits digits of the model number,
+    3 by default, so they wrap around after model 999 and a later photo
+    overwrites the one with the same name. The photos are therefore ordered
+    by modification time, which copying with copy2 preserves, and only ties
+    are broken by the number in the name.
+
+    Args:
+        photo_dir (str): Photo directory of the run.
+    """
+
+    def __init__(self, photo_dir: str) -> None:
+        self.photo_dir = photo_dir
+        self.photos: Dict[str, Tuple[int, int]] = {}
+
+    def refresh(self) -> None:
+        """Reads the names and modification times of the photos."""
+        photos = {}
+        try:
+            with os.scandir(self.photo_dir) as entries:
+                for entry in entries:
+                    match = photo_regex.match(entry.name)
+                    if match is None:
+                        continue
+                    try:
+                        mtime_ns = entry.stat().st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+                    photos[entry.name] = (mtime_ns, int(match.group(1)))
+        except FileNotFoundError:
+            pass
+        self.photos = photos
+
+    def names(self) -> List[str]:
+        """Returns the names of all photos, oldest first."""
+        self.refresh()
+        return sorted(self.photos, key=self.photos.get)
+
+    def latest(self, since_ns: int = None) -> Optional[Tuple[int, str]]:
+        """Returns the photo that was written last.
+
+        Args:
+            since_ns (int): Only consider photos written at or after this
+                time, in nanoseconds since the epoch.
+
+        Returns:
+            number, name (tuple): Number in the name of the photo, which is
+                the model number modulo 10**photo_digits, and its name. None
+                if there is no photo.
+        """
+        self.refresh()
+        photos = [
+            (stamp, name)
+            for name, stamp in self.photos.items()
+            if since_ns is None or stamp[0] >= since_ns
+        ]
+        if not photos:
+            return None
+        (_, number), name = max(photos)
+        return number, name
+
+
+def photo_model_number(number: int, digits: int, near: int) -> int:
+    """Resolves the number in a photo name into a model number.
+
+    Args:
+        number (int): Number in the photo name.
+        digits (int): Number of digits in the name, photo_digits.
+        near (int): Model number the photo is known to be close to, e.g.
+            the last model in the history.
+
+    Returns:
+        model_number (int): The model number closest to near whose last
+            digits are number.
+    """
+    period = 10**digits
+    model_number = near - (near - number) % period
+    if near - model_number > period // 2:
+        model_number += period
+    return model_number
@@ -0,0 +1,222 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Sequence, Tuple, Union
+
+from mesatools.reader import read_data
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# profile columns the profiles can be interpolated along
+coordinates = ("mass", "radius", "logR")
+
+
+class ProfileEntry(NamedTuple):
+    """Line of a profiles.index file."""
+
+    model_number: int
+    priority: int
+    profile_number: int
+
+
+class ProfileSeries(NamedTuple):
+    """Profiles of a run, interpolated onto a common coordinate grid.
+
+    Attributes:
+        models (np.ndarray): Model number of every profile, ascending.
+        ages (np.ndarray): star_age of every profile.
+        coordinate (str): Column the profiles were interpolated along.
+        grid (np.ndarray): Values of the coordinate.
+        data (dict): {column: values}, every value an array with shape
+            (profiles, grid points). Grid points outside of a profile are
+            NaN.
+    """
+
+    models: "np.ndarray"
+    ages: "np.ndarray"
+    coordinate: str
+    grid: "np.ndarray"
+    data: Dict[str, "np.ndarray"]
+
+
+def read_profile_index(
+    log_dir: str = "LOGS", index_name: str = "profiles.index"
+) -> List[ProfileEntry]:
+    """Reads the profiles of a run from its profile index.
+
+    Args:
+        log_dir (str): Log directory of the run.
+        index_name (str): profiles_index_name of the run.
+
+    Returns:
+        entries (list): ProfileEntry of every profile, by model number. If a
+            model was written twice, the last entry is kept.
+    """
+    entries: Dict[int, ProfileEntry] = {}
+    with open(os.path.join(log_dir, index_name)) as file:
+        file.readline()
+        for line in file:
+            values = line.split()
+            if len(values) != 3:
+                continue
+            entry = ProfileEntry(*map(int, values))
+            entries[entry.model_number] = entry
+    return [entries[model] for model in sorted(entries)]
+
+
+def load_profile_series(
+    columns: Sequence[str],
+    log_dir: str = "LOGS",
+    coordinate: str = "mass",
+    grid: Union[int, Sequence[float], "np.ndarray"] = 200,
+    stride: int = 1,
+    models: Sequence[int] = None,
+    prefix: str = "profile",
+    index_name: str = "profiles.index",
+    processes: int = None,
+    cache: bool = True,
+) -> ProfileSeries:
+    """Loads columns of all profiles of a run onto a common grid.
+
+    The profiles are listed from the profile index and read with read_data
+    in worker processes, so their sidecars are written on the first call
+    and memory mapped on later ones. All profiles are then interpolated
+    onto the grid at once.
+
+    Args:
+        columns (Sequence): Columns to load.
+        log_dir (str): Log directory of the run.
+        coordinate (str): "mass", "radius" or "logR".
+        grid (int or Sequence): Values of the coordinate to interpolate
+            onto, or their number, spread evenly from zero, or the smallest
+            logR, to the largest value of all profiles.
+        stride (int): Only load every stride-th profile of the index. The
+            last profile is always loaded.
+        models (Sequence): Only load the profiles of these model numbers.
+        prefix (str): profile_data_prefix of the run.
+        index_name (str): profiles_index_name of the run.
+        processes (int): Number of worker processes, one per CPU by default.
+        cache (bool): Read and write the sidecars of the profiles.
+
+    Returns:
+        series (ProfileSeries): Ages and the interpolated columns.
+    """
+    import numpy as np
+
+    if coordinate not in coordinates:
+        raise ValueError(
+            f"{coordinate} is not a valid option, " f"use {', '.join(coordinates)}."
+        )
+    entries = read_profile_index(log_dir, index_name)
+    if models is not None:
+        wanted = set(models)
+        entries = [entry for entry in entries if entry.model_number in wanted]
+    if stride > 1 and entries:
+        last = entries[-1]
+        entries = entries[::stride]
+        if entries[-1] != last:
+            entries.append(last)
+    if not entries:
+        raise ValueError(f"no profiles found in {log_dir}")
+
+    columns = list(columns)
+    jobs = [
+        (
+            os.path.join(log_dir, f"{prefix}{entry.profile_number}.data"),
+            coordinate,
+            columns,
+            cache,
+        )
+        for entry in entries
+    ]
+    processes = max(1, min(processes or os.cpu_count() or 1, len(jobs)))
+    if processes == 1:
+        profiles = list(map(load_profile, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunksize = max(1, len(jobs) // (4 * processes))
+            profiles = list(executor.map(load_profile, jobs, chunksize=chunksize))
+
+    ages = np.array([age for age, _, _ in profiles])
+    coords = [coord for _, coord, _ in profiles]
+    values = [value for _, _, value in profiles]
+    if np.isscalar(grid):
+        low = 0.0 if coordinate != "logR" else min(coord[0] for coord in coords)
+        high = max(coord[-1] for coord in coords)
+        grid = np.linspace(low, high, int(grid))
+    else:
+        grid = np.asarray(grid, dtype=float)
+
+    interpolated = interpolate_profiles(coords, values, grid)
+    return ProfileSeries(
+        models=np.array([entry.model_number for entry in entries]),
+        ages=ages,
+        coordinate=coordinate,
+        grid=grid,
+        data={name: interpolated[i] for i, name in enumerate(columns)},
+    )
+
+
+def load_profile(
+    job: Tuple[str, str, List[str], bool],
+) -> Tuple[float, "np.ndarray", "np.ndarray"]:
+    """Reads (star_age, coordinate, values) of one profile.
+
+    The coordinate is returned in ascending order, MESA writes the surface
+    first, and values has shape (columns, zones).
+    """
+    import numpy as np
+
+    file_name, coordinate, columns, cache = job
+    profile = read_data(file_name, [coordinate] + columns, cache)
+    data = np.array(profile.data)
+    if data.shape[1] > 1 and data[0, 0] > data[0, -1]:
+        data = data[:, ::-1]
+    return float(profile.header.get("star_age", np.nan)), data[0], data[1:]
+
+
+def interpolate_profiles(
+    coords: Sequence["np.ndarray"],
+    values: Sequence["np.ndarray"],
+    grid: "np.ndarray",
+) -> "np.ndarray":
+    """Linearly interpolates profiles with different zones onto one grid.
+
+    The profiles are concatenated, each shifted by a multiple of the range
+    of all coordinates, so a single searchsorted finds the zones around
+    every grid point of every profile.
+
+    Args:
+        coords (Sequence): Ascending coordinate of every profile.
+        values (Sequence): Values of every profile, shape (columns, zones).
+        grid (np.ndarray): Coordinates to interpolate onto.
+
+    Returns:
+        interpolated (np.ndarray): Shape (columns, profiles, grid points),
+            NaN outside of a profile.
+    """
+    import numpy as np
+
+    lengths = np.array([len(coord) for coord in coords])
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    x = np.concatenate(coords)
+    y = np.concatenate(values, axis=1)
+
+    low = min(x.min(), grid.min())
+    span = max(x.max(), grid.max()) - low + 1.0
+    rows = np.arange(len(coords))
+    shifted = (x - low) + np.repeat(rows, lengths) * span
+    queries = (grid[None, :] - low) + rows[:, None] * span
+
+    # index of the first zone above every grid point, within its profile
+    upper = np.searchsorted(shifted, queries, side="right")
+    upper = np.clip(upper, (starts + 1)[:, None], (ends - 1)[:, None])
+    lower = upper - 1
+    x0, x1 = x[lower], x[upper]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.where(x1 > x0, (grid - x0) / (x1 - x0), 0.0)
+    interpolated = y[:, lower] * (1 - weight) + y[:, upper] * weight
+    outside = (grid < x[starts][:, None]) | (grid > x[ends - 1][:, None])
+    interpolated[:, outside] = np.nan
+    return interpolated
@@ -0,0 +1,87 @@
+from typing import List, NamedTuple, Optional
+
+
+class RunProgress(NamedTuple):
+    """Progress of a MESA run, as printed in its terminal output.
+
+    Attributes:
+        model_number (int): Model number (step).
+        age (float): Star age in years.
+        log_dt (float): log10 of the timestep in years.
+        zones (int): Number of zones.
+        retries (int): Number of retries so far.
+    """
+
+    model_number: int
+    age: float
+    log_dt: float
+    zones: int
+    retries: int
+
+    @property
+    def dt(self) -> float:
+        """Timestep in years."""
+        return 10**self.log_dt
+
+
+class ProgressParser:
+    """Extracts RunProgress events from MESA's terminal output.
+
+    Every terminal_interval steps MESA prints a block of three rows. The
+    first starts with the model number and ends with the zones and retries,
+    the second starts with lg_dt_yr and the third with age_yr. Lines are
+    fed one at a time and an event is returned once a block is complete.
+    """
+
+    def __init__(self) -> None:
+        self.rows: List[List[str]] = []
+
+    def feed(self, line: str) -> Optional[RunProgress]:
+        """Parses a line of output.
+
+        Args:
+            line (str): Line printed by MESA.
+
+        Returns:
+            progress (RunProgress): Event if line completed a block, None
+                otherwise.
+        """
+        tokens = line.split()
+        if self.rows:
+            if tokens and is_number(tokens[0]):
+                self.rows.append(tokens)
+                if len(self.rows) == 3:
+                    return self.finish()
+                return None
+            self.rows = []
+
+        if (
+            len(tokens) >= 10
+            and tokens[0].isdigit()
+            and tokens[-1].isdigit()
+            and tokens[-2].isdigit()
+        ):
+            self.rows = [tokens]
+        return None
+
+    def finish(self) -> Optional[RunProgress]:
+        first, second, third = self.rows
+        self.rows = []
+        try:
+            return RunProgress(
+                model_number=int(first[0]),
+                age=float(third[0]),
+                log_dt=float(second[0]),
+                zones=int(first[-2]),
+                retries=int(first[-1]),
+            )
+        except ValueError:
+            return None
+
+
+def is_number(token: str) -> bool:
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
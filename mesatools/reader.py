@@ -0,0 +1,290 @@
+import json
+import os
+import re
+import tempfile
+import warnings
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from mesatools.utils.fileops import sidecar_suffixes
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# a header value is either a quoted string or a whitespace separated token
+tokenRegex = re.compile(r'"[^"]*"|\S+')
+
+# Fortran drops the E of three digit exponents, e.g. 1.234-100
+exponentRegex = re.compile(rb"(?<=[\d.])([+-]\d{3})(?=\s|$)")
+
+# model number in the header of a saved model
+modelNumberRegex = re.compile(r"^\s*model_number\s+(\d+)\s*$")
+
+# format of the binary sidecars written by read_data
+sidecarFormat = 1
+
+# history.data: header column numbers, names and values, a blank line, the
+# column numbers and the column names, followed by one row per model
+history_names_line = 6
+
+
+def read_header(file_name: str) -> Dict[str, Any]:
+    """Reads the header attributes of a MESA profile or history file.
+
+    Only the first three lines are read: the column numbers, the names and
+    the values of the header attributes. The data columns are skipped.
+
+    Args:
+        file_name (str): Profile or history file.
+
+    Returns:
+        header (dict): {name: value} of the header attributes.
+    """
+    with open(file_name) as file:
+        file.readline()
+        names = file.readline().split()
+        values = tokenRegex.findall(file.readline())
+    if len(names) != len(values):
+        raise ValueError(f"could not read the header of {file_name}")
+    return {name: parse_value(value) for name, value in zip(names, values)}
+
+
+def read_last_row(file_name: str) -> Dict[str, Any]:
+    """Reads the last row of a MESA history file.
+
+    Only the column names and the end of the file are read, so the cost does
+    not grow with the number of models.
+
+    Args:
+        file_name (str): History file.
+
+    Returns:
+        row (dict): {name: value} of the last model, empty if there is none.
+    """
+    with open(file_name, "rb") as file:
+        for _ in range(history_names_line):
+            names = file.readline().split()
+        data_start = file.tell()
+        position = file.seek(0, os.SEEK_END)
+        block = b""
+        while position > data_start and b"\n" not in block.strip():
+            step = min(8192, position - data_start)
+            position -= step
+            file.seek(position)
+            block = file.read(step) + block
+    last = block.strip().rsplit(b"\n", 1)[-1].split()
+    if not last:
+        return {}
+    if len(last) != len(names):
+        raise ValueError(f"could not read the last row of {file_name}")
+    return {
+        name.decode(): parse_value(value.decode()) for name, value in zip(names, last)
+    }
+
+
+def read_model_number(file_name: str) -> Optional[int]:
+    """Reads the model number from the header of a saved MESA model.
+
+    Args:
+        file_name (str): Model written by save_model_when_terminate.
+
+    Returns:
+        model_number (int): None if the header does not contain it.
+    """
+    with open(file_name) as file:
+        for _, line in zip(range(200), file):
+            match = modelNumberRegex.match(line)
+            if match:
+                return int(match.group(1))
+    return None
+
+
+def parse_value(value: str) -> Any:
+    """Converts a header value into an int, float or string."""
+    if value.startswith('"'):
+        return value.strip('"').strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value.replace("D", "E").replace("d", "e"))
+    except ValueError:
+        return value
+
+
+class MesaData:
+    """Columns and header attributes of a MESA history or profile file.
+
+    Columns are float64 arrays. When read from a sidecar they are read-only
+    views of a memory map.
+
+    Attributes:
+        header (dict): {name: value} of the header attributes.
+        names (list): Names of the columns.
+        data (np.ndarray): Values with shape (columns, rows).
+    """
+
+    def __init__(
+        self, header: Dict[str, Any], names: List[str], data: "np.ndarray"
+    ) -> None:
+        self.header = header
+        self.names = names
+        self.data = data
+        self.columns = {name: index for index, name in enumerate(names)}
+
+    def __getitem__(self, name: str) -> "np.ndarray":
+        try:
+            return self.data[self.columns[name]]
+        except KeyError:
+            raise KeyError(f"{name} is not a column.") from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __len__(self) -> int:
+        return self.data.shape[1]
+
+    def keys(self) -> List[str]:
+        return list(self.names)
+
+
+def read_data(
+    file_name: str, columns: Sequence[str] = None, cache: bool = True
+) -> MesaData:
+    """Reads the columns of a MESA history or profile file.
+
+    The parsed values are stored in a binary sidecar, file_name.npy, which
+    later reads memory map instead of parsing the file again. The sidecar
+    is rewritten when the size or modification time of the file changes.
+    If it cannot be written, e.g. in a read-only directory, the file is
+    parsed every time.
+
+    Args:
+        file_name (str): History or profile file.
+        columns (Sequence): Names of the columns to load, all by default.
+        cache (bool): Read and write the sidecar.
+
+    Returns:
+        data (MesaData): Header and columns.
+    """
+    stat = os.stat(file_name)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    loaded = load_sidecar(file_name, stamp) if cache else None
+    if loaded is None:
+        header, names, data = parse_data(file_name)
+        if cache:
+            write_sidecar(file_name, stamp, header, names, data)
+    else:
+        header, names, data = loaded
+
+    if columns is not None:
+        index = {name: i for i, name in enumerate(names)}
+        missing = [name for name in columns if name not in index]
+        if missing:
+            raise KeyError(f"{', '.join(missing)} not found in {file_name}.")
+        selected = [index[name] for name in columns]
+        if loaded is not None and selected == list(
+            range(selected[0], selected[-1] + 1)
+        ):
+            # a contiguous range stays a view of the memory map
+            data = data[selected[0] : selected[-1] + 1]
+        else:
+            data = data[selected]
+        names = list(columns)
+    return MesaData(header, names, data)
+
+
+def parse_data(file_name: str) -> Tuple[Dict[str, Any], List[str], "np.ndarray"]:
+    """Parses a history or profile file into (header, names, data)."""
+    import numpy as np
+
+    with open(file_name, "rb") as file:
+        lines = [file.readline() for _ in range(history_names_line)]
+        body = file.read()
+    header_names = lines[1].decode().split()
+    header_values = tokenRegex.findall(lines[2].decode())
+    if len(header_names) != len(header_values):
+        raise ValueError(f"could not read the header of {file_name}")
+    header = {
+        name: parse_value(value) for name, value in zip(header_names, header_values)
+    }
+    names = lines[history_names_line - 1].decode().split()
+
+    try:
+        # numpy 1.x only warns about unparsable text and returns the values
+        # before it, later versions raise
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            values = np.fromstring(body, sep=" ")
+    except (ValueError, DeprecationWarning):
+        values = np.fromstring(exponentRegex.sub(rb"E\1", body), sep=" ")
+    if values.size % len(names):
+        raise ValueError(f"{file_name} has incomplete rows")
+    data = np.ascontiguousarray(values.reshape(-1, len(names)).T)
+    return header, names, data
+
+
+def sidecar_names(file_name: str) -> Tuple[str, str]:
+    array_suffix, meta_suffix = sidecar_suffixes
+    return file_name + array_suffix, file_name + meta_suffix
+
+
+def load_sidecar(
+    file_name: str, stamp: List[int]
+) -> Tuple[Dict[str, Any], List[str], "np.ndarray"]:
+    """Memory maps the sidecar of a file, None if it is missing or stale."""
+    import numpy as np
+
+    array_file, meta_file = sidecar_names(file_name)
+    try:
+        with open(meta_file) as file:
+            meta = json.load(file)
+        if meta.get("format") != sidecarFormat or meta.get("stamp") != stamp:
+            return None
+        data = np.load(array_file, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if data.shape != (len(meta["names"]), meta["rows"]):
+        return None
+    return meta["header"], meta["names"], data
+
+
+def write_sidecar(
+    file_name: str,
+    stamp: List[int],
+    header: Dict[str, Any],
+    names: List[str],
+    data: "np.ndarray",
+) -> None:
+    import numpy as np
+
+    array_file, meta_file = sidecar_names(file_name)
+    meta = {
+        "format": sidecarFormat,
+        "stamp": stamp,
+        "header": header,
+        "names": names,
+        "rows": data.shape[1],
+    }
+    directory = os.path.dirname(os.path.abspath(file_name))
+    written = []
+    try:
+        # the metadata is written last, it marks the sidecar as valid; every
+        # writer uses its own temporary files, so concurrent readers of the
+        # same file never mix their output
+        if os.path.lexists(meta_file):
+            os.remove(meta_file)
+        fd, tmp_name = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+        written.append(tmp_name)
+        with os.fdopen(fd, "wb") as file:
+            np.save(file, data)
+        os.replace(tmp_name, array_file)
+        fd, tmp_name = tempfile.mkstemp(dir=directory, suffix=".json.tmp")
+        written.append(tmp_name)
+        with os.fdopen(fd, "w") as file:
+            json.dump(meta, file)
+        os.replace(tmp_name, meta_file)
+    except OSError:
+        for name in written:
+            if os.path.lexists(name):
+                os.remove(name)
@@ -0,0 +1,166 @@
+import os
+from functools import partial
+from types import MappingProxyType
+from typing import Callable, Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+from mesatools.schema import DefaultsSchema, scanKeys
+
+
+class DefaultsRegistry:
+    """Process-wide cache of MESA defaults.
+
+    Each defaults section is loaded once per process, on first use, and
+    shared by every MesaAccess instance as a read-only mapping. Entries are
+    keyed by the location of the defaults file, the MESA version and the
+    modification time of the file, so editing a defaults file or switching
+    MESA_DIR triggers a reload.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Hashable, Mapping] = {}
+        self._keys: Dict[Hashable, Tuple[str, ...]] = {}
+        self._schemas: Dict[Hashable, DefaultsSchema] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Mapping],
+        reload: bool = False,
+    ) -> Mapping:
+        """Returns the shared view for key, loading it if necessary.
+
+        Args:
+            key (Hashable): Registry key, see makeKey.
+            loader (Callable): Returns the defaults namelist.
+            reload (bool): Replace an existing entry.
+
+        Returns:
+            view (Mapping): Read-only {section: {key: default}} mapping.
+        """
+        if reload or key not in self._entries:
+            nml = loader()
+            view = {
+                section: MappingProxyType(dict(values))
+                for section, values in nml.items()
+            }
+            self._entries[key] = MappingProxyType(view)
+            if reload:
+                self._keys.pop(key, None)
+                self._schemas = {k: v for k, v in self._schemas.items() if key not in k}
+        return self._entries[key]
+
+    def getKeys(
+        self, key: Hashable, src: str, loader: Callable[[], Mapping]
+    ) -> Tuple[str, ...]:
+        """Returns the key names of a defaults file.
+
+        The names are scanned from the .defaults file, which is much cheaper
+        than loading the defaults. If the file is not available, the
+        defaults are loaded instead.
+
+        Args:
+            key (Hashable): Registry key, see makeKey.
+            src (str): Path to the .defaults file.
+            loader (Callable): Returns the defaults namelist.
+
+        Returns:
+            keys (tuple): Key names of the section.
+        """
+        if key not in self._keys:
+            try:
+                self._keys[key] = scanKeys(src)
+            except OSError:
+                view = self.get(key, loader)
+                self._keys[key] = tuple(
+                    name for values in view.values() for name in values
+                )
+        return self._keys[key]
+
+    def getSchema(
+        self,
+        specs: Sequence[
+            Tuple[str, Hashable, str, Callable[[], Mapping], Callable[[], Mapping]]
+        ],
+    ) -> DefaultsSchema:
+        """Returns the schema of several defaults sections.
+
+        Only the key names are needed to build the schema; the defaults of a
+        section are loaded through the registry on first use.
+
+        Args:
+            specs (Sequence): (section, registry key, .defaults path, loader,
+                bounds loader) tuples in lookup priority order. The bounds
+                loader returns {key: (first, last)} of the vectors.
+
+        Returns:
+            schema (DefaultsSchema): Shared key index of all sections.
+        """
+        schemaKey = tuple(key for _, key, _, _, _ in specs)
+        if schemaKey not in self._schemas:
+            sectionKeys = {}
+            loaders = {}
+            boundsLoaders = {}
+            for section, key, src, loader, boundsLoader in specs:
+                sectionKeys[section] = self.getKeys(key, src, loader)
+                loaders[section] = partial(self.getSection, key, loader, section)
+                boundsLoaders[section] = boundsLoader
+            self._schemas[schemaKey] = DefaultsSchema(
+                sectionKeys, loaders, boundsLoaders
+            )
+        return self._schemas[schemaKey]
+
+    def getSection(
+        self, key: Hashable, loader: Callable[[], Mapping], section: str
+    ) -> Mapping:
+        return self.get(key, loader)[section]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys.clear()
+        self._schemas.clear()
+
+    @staticmethod
+    def makeKey(src: str, version: str, whichDefaults: str) -> Hashable:
+        """Builds the registry key for a defaults file.
+
+        Args:
+            src (str): Path to the .defaults file.
+            version (str): MESA version the file belongs to.
+            whichDefaults (str): Defaults section.
+
+        Returns:
+            key (Hashable): Registry key.
+        """
+        try:
+            mtime = os.stat(src).st_mtime_ns
+        except OSError:
+            mtime = None
+        return (os.path.abspath(src), version, whichDefaults, mtime)
+
+
+def getMesaVersion(mesaDir: str) -> Optional[str]:
+    """Reads the version number of a MESA installation.
+
+    Args:
+        mesaDir (str): MESA directory.
+
+    Returns:
+        version (str): Version string or None if it cannot be determined.
+    """
+    versionFile = os.path.join(mesaDir, "data", "version_number")
+    try:
+        with open(versionFile) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+defaultsRegistry = DefaultsRegistry()
+
+
+def clearRegistry() -> None:
+    """Drops all shared defaults of this process."""
+    defaultsRegistry.clear()
@@ -0,0 +1,162 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+from mesatools.inlist import MesaInlist
+from mesatools.utils.fileops import archive_file, archive_tree, file_digest
+
+# keys that change how a run is shown, not what it computes
+volatile_keys = {"pause_before_terminate", "pgstar_flag"}
+
+# keys naming files a run writes rather than reads
+output_keys = {
+    "save_model_filename",
+    "filename_for_profile_when_terminate",
+    "star_history_name",
+    "log_directory",
+    "photo_directory",
+    "profiles_index_name",
+}
+
+
+def run_key(inList: MesaInlist, work_dir: str, path_to_star: str) -> str:
+    """Hashes everything that determines the outcome of a run.
+
+    The key covers the effective inlist (with all read_extra_*_inlist
+    includes resolved), the content of every input file it names that
+    exists in the work directory, the MESA version and the star executable.
+
+    Args:
+        inList (MesaInlist): Inlist of the run, as MESA will read it.
+        work_dir (str): Work directory of the run.
+        path_to_star (str): star executable, relative to work_dir.
+
+    Returns:
+        key (str): Hex digest identifying the run.
+    """
+    effective = inList.getEffectiveInlist()
+    digest = hashlib.sha256()
+    digest.update(f"version={inList.inlist.getVersion()}\n".encode())
+    digest.update(
+        f"star={file_digest(os.path.join(work_dir, path_to_star))}\n".encode()
+    )
+    for section in sorted(effective.sections):
+        values = effective.sections[section]
+        for key in sorted(values):
+            if key in volatile_keys:
+                continue
+            value = values[key]
+            digest.update(f"{section}.{key}={value!r}\n".encode())
+            if isinstance(value, str) and key not in output_keys:
+                input_file = os.path.join(work_dir, value)
+                if os.path.isfile(input_file):
+                    digest.update(f"file={file_digest(input_file)}\n".encode())
+    return digest.hexdigest()
+
+
+class RunCache:
+    """Content-addressed store of completed MESA runs.
+
+    Every entry holds the outputs of a converged run (final model, profile
+    and log directory) under the key of the run, see run_key. Entries are
+    written to a temporary directory and renamed into place, so concurrent
+    runners never see partial entries. Files are cloned rather than copied
+    on file systems with reflinks.
+
+    Args:
+        root (str): Directory of the cache.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the metadata of an entry, None if there is none."""
+        try:
+            with open(os.path.join(self.entry_path(key), "result.json")) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def store(
+        self,
+        key: str,
+        work_dir: str,
+        files: Iterable[str],
+        dirs: Iterable[str],
+        meta: Dict[str, Any],
+    ) -> None:
+        """Copies the outputs of a run into the cache.
+
+        Args:
+            key (str): Key of the run.
+            work_dir (str): Work directory of the run.
+            files (Iterable): Output files, relative to work_dir.
+            dirs (Iterable): Output directories, relative to work_dir.
+            meta (dict): Additional information stored with the entry.
+        """
+        path = self.entry_path(key)
+        if os.path.isdir(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            stored_files = []
+            for name in files:
+                src = os.path.join(work_dir, name)
+                if os.path.isfile(src):
+                    dst = os.path.join(tmp_path, "outputs", name)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    archive_file(src, dst)
+                    stored_files.append(name)
+            stored_dirs = []
+            for name in dirs:
+                src = os.path.join(work_dir, name)
+                if os.path.isdir(src):
+                    archive_tree(src, os.path.join(tmp_path, "outputs", name))
+                    stored_dirs.append(name)
+            meta = dict(
+                meta,
+                key=key,
+                files=stored_files,
+                dirs=stored_dirs,
+                created=datetime.datetime.now().isoformat(),
+            )
+            with open(os.path.join(tmp_path, "result.json"), "w") as file:
+                json.dump(meta, file, indent=2)
+            os.rename(tmp_path, path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+
+    def restore(self, key: str, work_dir: str) -> Optional[Dict[str, Any]]:
+        """Copies the outputs of a cached run into a work directory.
+
+        Args:
+            key (str): Key of the run.
+            work_dir (str): Work directory to restore into.
+
+        Returns:
+            meta (dict): Metadata of the entry, None if there is none.
+        """
+        meta = self.lookup(key)
+        if meta is None:
+            return None
+        outputs = os.path.join(self.entry_path(key), "outputs")
+        for name in meta["files"]:
+            dst = os.path.join(work_dir, name)
+            os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+            archive_file(os.path.join(outputs, name), dst)
+        for name in meta["dirs"]:
+            dst = os.path.join(work_dir, name)
+            shutil.rmtree(dst, ignore_errors=True)
+            archive_tree(os.path.join(outputs, name), dst)
+        return meta
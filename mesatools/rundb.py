@@ -0,0 +1,263 @@
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+from contextlib import closing
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from mesatools.inlist import MesaInlist
+from mesatools.runcache import volatile_keys
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# ru_maxrss is in bytes on macOS and in KiB elsewhere
+maxrss_scale = 1 if sys.platform == "darwin" else 1024
+
+# (user seconds, system seconds, peak resident bytes)
+Usage = Tuple[float, float, int]
+
+
+class RunMetrics(NamedTuple):
+    """Resource usage and outcome of a single MESA run.
+
+    Attributes:
+        started (str): Start of the run, in ISO format.
+        inlist (str): Inlist that was run.
+        work_dir (str): Work directory of the run.
+        host (str): Machine the run ran on.
+        threads (int): OMP_NUM_THREADS of the run, None if not set.
+        inlist_hash (str): sha256 of params, None if the inlist could not
+            be read.
+        params (dict): {key: value} of the effective inlist, only collected
+            if the run is recorded in a RunDatabase.
+        convergence (bool): Whether the run converged.
+        restored (bool): Whether the run was restored from a run cache.
+        failure_reason (str): Why the watchdog stopped the run, if it did.
+        returncode (int): Exit code of star.
+        wall_time (float): Seconds the run took.
+        user_time (float): CPU seconds spent in user mode.
+        system_time (float): CPU seconds spent in the kernel.
+        max_rss (int): Peak resident memory in bytes.
+        models (int): Number of models evolved in the run.
+        retries (int): Number of retries.
+        star_age (float): Age at the end of the run.
+    """
+
+    started: str
+    inlist: str
+    work_dir: str
+    host: str
+    threads: Optional[int]
+    inlist_hash: Optional[str]
+    params: Dict[str, Any]
+    convergence: bool
+    restored: bool
+    failure_reason: Optional[str]
+    returncode: Optional[int]
+    wall_time: float
+    user_time: Optional[float]
+    system_time: Optional[float]
+    max_rss: Optional[int]
+    models: Optional[int]
+    retries: Optional[int]
+    star_age: Optional[float]
+
+
+column_types = {
+    "threads": "INTEGER",
+    "params": "TEXT",
+    "convergence": "INTEGER",
+    "restored": "INTEGER",
+    "returncode": "INTEGER",
+    "wall_time": "REAL",
+    "user_time": "REAL",
+    "system_time": "REAL",
+    "max_rss": "INTEGER",
+    "models": "INTEGER",
+    "retries": "INTEGER",
+    "star_age": "REAL",
+}
+
+schema = (
+    "CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, "
+    + ", ".join(
+        f"{name} {column_types.get(name, 'TEXT')}" for name in RunMetrics._fields
+    )
+    + ");\n"
+    "CREATE INDEX IF NOT EXISTS runs_inlist_hash ON runs (inlist_hash);"
+)
+
+# inlist keys that can be used in queries, e.g. x_ctrl(1)
+paramRegex = re.compile(r"^[a-z_][a-z0-9_]*(\(\d+\))?$")
+
+
+def inlist_params(inList: MesaInlist) -> Dict[str, Any]:
+    """Returns {key: value} of the effective inlist, without volatile keys."""
+    effective = inList.getEffectiveInlist()
+    params = {}
+    for section in sorted(effective.sections):
+        values = effective.sections[section]
+        for key in sorted(values):
+            if key not in volatile_keys:
+                params[key] = values[key]
+    return params
+
+
+def usage_of(rusage: Any) -> Usage:
+    """Converts a resource.struct_rusage, e.g. from os.wait4, into Usage."""
+    return rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss * maxrss_scale
+
+
+def children_usage(before: Usage = None) -> Optional[Usage]:
+    """Returns the resource usage of the terminated children of this process.
+
+    Args:
+        before (Usage): Earlier result, to get the usage since then. The
+            peak memory is the peak of all children, not only the new ones.
+
+    Returns:
+        usage (Usage): None if the resource module is not available.
+    """
+    if resource is None:
+        return None
+    user, system, max_rss = usage_of(resource.getrusage(resource.RUSAGE_CHILDREN))
+    if before is not None:
+        user, system = user - before[0], system - before[1]
+    return user, system, max_rss
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class RunDatabase:
+    """Local SQLite database of RunMetrics.
+
+    Several processes may record into the same database, e.g. the workers
+    of MesaScheduler.
+
+    Args:
+        path (str): Database file, created if it does not exist.
+    """
+
+    def __init__(self, path: str = "mesa_runs.sqlite") -> None:
+        self.path = path
+        with closing(self.connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(schema)
+
+    def connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=60)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def record(self, metrics: RunMetrics) -> int:
+        """Adds a run to the database.
+
+        Returns:
+            id (int): Row id of the run.
+        """
+        values = metrics._replace(params=json.dumps(metrics.params, default=str))
+        columns = ", ".join(RunMetrics._fields)
+        placeholders = ", ".join("?" * len(RunMetrics._fields))
+        with closing(self.connect()) as db, db:
+            cursor = db.execute(
+                f"INSERT INTO runs ({columns}) VALUES ({placeholders})", values
+            )
+            return cursor.lastrowid
+
+    def query(
+        self, where: str = None, args: Sequence[Any] = (), **filters: Any
+    ) -> List[Dict[str, Any]]:
+        """Returns the recorded runs, oldest first.
+
+        Args:
+            where (str): SQL condition, with ? placeholders for args.
+            args (Sequence): Values of the placeholders.
+            **filters: column=value or inlist_key=value conditions.
+
+        Returns:
+            runs (list): Every matching run as a dict, params as a dict.
+        """
+        condition, args = self.condition(where, args, filters)
+        with closing(self.connect()) as db:
+            rows = db.execute(f"SELECT * FROM runs{condition} ORDER BY id", args)
+            runs = [dict(row) for row in rows]
+        for run in runs:
+            run["params"] = json.loads(run["params"])
+        return runs
+
+    def compare(
+        self,
+        by: Sequence[str] = ("threads",),
+        where: str = None,
+        args: Sequence[Any] = (),
+        **filters: Any,
+    ) -> List[Dict[str, Any]]:
+        """Compares the throughput of groups of runs.
+
+        Restored runs are left out, they did not evolve anything.
+
+        Args:
+            by (Sequence): Columns or inlist keys to group the runs by.
+            where (str): SQL condition, with ? placeholders for args.
+            args (Sequence): Values of the placeholders.
+            **filters: column=value or inlist_key=value conditions.
+
+        Returns:
+            groups (list): The values of by, the number of runs, converged
+                runs, mean wall time, mean CPU time, the highest peak
+                memory and models evolved per second, for every group.
+        """
+        groups = [self.column(name) for name in by]
+        condition, args = self.condition(where, args, dict(filters, restored=False))
+        selected = ", ".join(
+            f"{group} AS {quote(name)}" for group, name in zip(groups, by)
+        )
+        grouped = ", ".join(groups)
+        sql = (
+            f"SELECT {selected + ', ' if selected else ''}"
+            "COUNT(*) AS runs, "
+            "SUM(convergence) AS converged, "
+            "AVG(wall_time) AS mean_wall_time, "
+            "AVG(user_time + system_time) AS mean_cpu_time, "
+            "MAX(max_rss) AS max_rss, "
+            "SUM(models) / SUM(wall_time) AS models_per_second "
+            f"FROM runs{condition}"
+            + (f" GROUP BY {grouped} ORDER BY {grouped}" if grouped else "")
+        )
+        with closing(self.connect()) as db:
+            return [dict(row) for row in db.execute(sql, args)]
+
+    def condition(
+        self, where: Optional[str], args: Sequence[Any], filters: Dict[str, Any]
+    ) -> tuple:
+        conditions = [f"({where})"] if where else []
+        args = list(args)
+        for name, value in filters.items():
+            if value is None:
+                conditions.append(f"{self.column(name)} IS NULL")
+            else:
+                conditions.append(f"{self.column(name)} = ?")
+                args.append(value)
+        condition = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return condition, args
+
+    @staticmethod
+    def column(name: str) -> str:
+        """Returns the SQL expression of a column or an inlist key."""
+        if name in RunMetrics._fields:
+            return name
+        name = name.lower()
+        if not paramRegex.match(name):
+            raise KeyError(f"{name} is neither a column nor an inlist key.")
+        return f"json_extract(params, '$.\"{name}\"')"
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
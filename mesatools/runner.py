@@ -1,15 +1,43 @@
+import asyncio
 import datetime
-import glob
+import inspect
+import json
+import logging
 import os
+import socket
+import sqlite3
 import subprocess
 import sys
-from distutils.dir_util import copy_tree
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
 from shutil import copy2, move
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
-import mesa_reader as mr
-import numpy as np
-
+from mesatools.build import build_star
+from mesatools.cleanup import clean_run_dirs
 from mesatools.inlist import MesaInlist
+from mesatools.photos import PhotoIndex, photo_model_number, photo_regex
+from mesatools.progress import ProgressParser, RunProgress
+from mesatools.reader import read_header, read_last_row, read_model_number
+from mesatools.runcache import RunCache, run_key
+from mesatools.rundb import (
+    RunDatabase,
+    RunMetrics,
+    Usage,
+    children_usage,
+    inlist_params,
+    params_hash,
+    usage_of,
+)
+from mesatools.utils.fileops import ArchiveStats, archive_tree, link_file, pack_tree
+from mesatools.watchdog import Watchdog
+
+ProgressCallback = Callable[[RunProgress], None]
+
+# progress of a list of inlists, used to resume it
+chain_state = ".mesatools_chain.json"
 
 
 class MesaRunner:
@@ -26,6 +54,7 @@ class MesaRunner:
         model_name (str): Output model name.
         profile_name (str): Output profile name.
         history_name (str): Output history name.
+        metrics (RunMetrics): Resource usage and outcome of the last run.
     """
 
     def __init__(
@@ -38,6 +67,11 @@ class MesaRunner:
         useMesaenv: bool = True,
         path_to_star: str = "./star",
         legacyInlist: bool = True,
+        work_dir: str = ".",
+        env: Dict[str, str] = None,
+        watchdog: Watchdog = None,
+        run_cache: Union[RunCache, str] = None,
+        run_db: Union[RunDatabase, str] = None,
     ):
         """__init__ method
 
@@ -49,6 +83,13 @@ class MesaRunner:
             reloadDefaults (bool): Reload default inlist files.
             useMesaenv (bool): Use MESA_ENV environment variable.
             legacyInlist (bool): Legacy inlist (before mesa-r15140).
+            work_dir (str): Directory MESA is run in.
+            env (dict): Extra environment variables for MESA.
+            watchdog (Watchdog): Stops runs that are unlikely to converge.
+            run_cache (RunCache or str): Cache of completed runs, or its
+                directory. Runs found in it are restored instead of run.
+            run_db (RunDatabase or str): Database, or its file, that the
+                metrics of every run are recorded in.
         """
         self.inlist = infile
         self.last_inlist = infile
@@ -57,56 +98,388 @@ class MesaRunner:
         self.useMesaenv = useMesaenv
         self.path_to_star = path_to_star
         self.legacyInlist = legacyInlist
+        self.work_dir = work_dir
+        self.env = dict(env or {})
+        self.watchdog = watchdog
+        if isinstance(run_cache, str):
+            run_cache = RunCache(run_cache)
+        self.run_cache = run_cache
+        if isinstance(run_db, str):
+            run_db = RunDatabase(run_db)
+        self.run_db = run_db
         self.pause = pause
         self.pgstar = pgstar
         self.model_name = ""
         self.profile_name = ""
         self.history_name = ""
+        self.log_dir = "LOGS"
+        self.photo_dir = "photos"
+        self.photos = None
+        self.failure_reason = None
         self.run_time = 0
+        self.output = deque(maxlen=1000)
+        self.progress = None
+        self.process = None
+        self.returncode = None
+        self.usage = None
+        self.metrics = None
 
         self.convergence = False
         if isinstance(self.inlist, list):
+            import numpy as np
+
             self.summary = np.zeros_like(self.inlist, dtype=bool)
         else:
             self.summary = False
 
-    def run(self, check_age: bool = True) -> None:
+    def run(self, check_age: bool = True, resume: bool = False) -> None:
         """Runs either a single inlist or a list of inlists.
 
+        With a run cache, the stages of a chain that are found in it are
+        restored, so the chain resumes from the first stage that changed.
+
         args:
             check_age (bool): Check whether the output
                               model has the desired max_age.
+            resume (bool): Skip the stages of a list of inlists that
+                finished in an earlier run of the same list and restart the
+                stage that was interrupted from its latest photo.
         """
         if isinstance(self.inlist, list):
+            stage, photo = self.resume_point() if resume else (0, None)
             for ind, item in enumerate(self.inlist):
                 self.last_inlist = item
-                self.run_support(item, check_age)
+                if ind < stage:
+                    print("Skipping", item, "which finished before")
+                    self.summary[ind] = True
+                    continue
+                if ind > stage or photo is None:
+                    self.write_chain_state(ind, time.time_ns())
+                self.run_support(item, check_age, photo if ind == stage else None)
                 self.summary[ind] = self.convergence
                 if not (self.convergence):
                     raise SystemExit("Aborting since", item, "failed to converge")
+                self.write_chain_state(ind + 1)
 
             print("Finished running inlists", self.inlist)
         else:
             self.run_support(self.inlist, check_age)
 
-    def run_support(self, inlist: str, check_age: bool) -> None:
+    async def run_async(
+        self,
+        check_age: bool = True,
+        on_progress: Union[ProgressCallback, Sequence[ProgressCallback]] = None,
+        log_file: str = "mesa.log",
+        max_log_bytes: int = 10 * 2**20,
+        backup_count: int = 3,
+    ) -> None:
+        """Runs either a single inlist or a list of inlists without blocking.
+
+        The terminal output of MESA is streamed into a rotating log file in
+        the work directory and the most recent lines are kept in
+        self.output. Several runners with their own work directories can
+        be awaited concurrently. MESA is not paused at the end of a run,
+        since there is no terminal to wait for.
+
+        Args:
+            check_age (bool): Check whether the output
+                              model has the desired max_age.
+            on_progress (Callable): Function or list of functions called
+                with a RunProgress for every terminal output block. They
+                may be coroutine functions.
+            log_file (str): Log file in the work directory.
+            max_log_bytes (int): Size at which the log file is rotated.
+            backup_count (int): Number of rotated log files to keep.
+        """
+        if on_progress is None:
+            callbacks = []
+        elif callable(on_progress):
+            callbacks = [on_progress]
+        else:
+            callbacks = list(on_progress)
+
+        handler = RotatingFileHandler(
+            self.work_path(log_file), maxBytes=max_log_bytes, backupCount=backup_count
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"{__name__}.{id(self)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            if isinstance(self.inlist, list):
+                for ind, item in enumerate(self.inlist):
+                    self.last_inlist = item
+                    await self.run_support_async(item, check_age, callbacks, logger)
+                    self.summary[ind] = self.convergence
+                    if not (self.convergence):
+                        raise SystemExit("Aborting since", item, "failed to converge")
+
+                print("Finished running inlists", self.inlist)
+            else:
+                await self.run_support_async(self.inlist, check_age, callbacks, logger)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+    async def run_support_async(
+        self,
+        inlist: str,
+        check_age: bool,
+        callbacks: List[ProgressCallback],
+        logger: logging.Logger,
+    ) -> None:
+        """Helper function for running MESA asynchronously.
+
+        Args:
+            inlist (str): Inlist to run.
+            check_age (bool): Check whether the output
+                              model has the desired max_age.
+            callbacks (list): Functions called with every RunProgress.
+            logger (Logger): Receives every line of output.
+        """
+        inList = self.prepare_run(inlist, pause=False)
+        start_time = datetime.datetime.now()
+        start_model = self.start_model(inList)
+        key = self.cache_key(inList)
+        if key is not None and self.restore_run(key, inList, inlist, check_age):
+            self.record_metrics(
+                inList, inlist, start_time, restored=True, start_model=start_model
+            )
+            return
+
+        start_time = datetime.datetime.now()
+        if os.path.isfile(self.work_path(self.path_to_star)):
+            print("Running", inlist)
+            # asyncio reaps star itself, so the usage of all children of
+            # this process is measured instead
+            usage = children_usage()
+            if self.watchdog is not None:
+                self.watchdog.start(self.work_path(self.log_dir, self.history_name))
+            self.process = await asyncio.create_subprocess_exec(
+                self.path_to_star,
+                cwd=self.work_dir,
+                env=self.get_env(),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=2**20,
+            )
+            if self.watchdog is not None:
+                callbacks = callbacks + [self.check_watchdog]
+            tasks = [
+                asyncio.create_task(
+                    self.stream_output(self.process.stdout, logger, callbacks)
+                ),
+                asyncio.create_task(
+                    self.stream_output(self.process.stderr, logger, None)
+                ),
+            ]
+            if self.watchdog is not None:
+                tasks.append(asyncio.create_task(self.watch_async()))
+            try:
+                self.returncode = await self.process.wait()
+                # read what is left in the pipes, unless a child of star
+                # keeps them open
+                done, _ = await asyncio.wait(tasks, timeout=5)
+                for task in done:
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                if self.process.returncode is None:
+                    self.process.kill()
+                    await self.process.wait()
+                self.usage = children_usage(usage)
+        else:
+            print("You need to build star first!")
+            sys.exit()
+        end_time = datetime.datetime.now()
+        self.check_run(inList, inlist, check_age, end_time - start_time)
+        self.store_run(key, inlist, check_age, end_time - start_time)
+        self.record_metrics(
+            inList, inlist, start_time, end_time - start_time, start_model=start_model
+        )
+
+    async def watch_async(self) -> None:
+        """Polls the watchdog until MESA exits or the watchdog trips."""
+        process = self.process
+        while process.returncode is None:
+            try:
+                await asyncio.wait_for(process.wait(), self.watchdog.poll_interval)
+            except asyncio.TimeoutError:
+                if self.watchdog.poll():
+                    self.check_watchdog()
+                    break
+        try:
+            await asyncio.wait_for(process.wait(), 10)
+        except asyncio.TimeoutError:
+            process.kill()
+
+    def check_watchdog(self, progress: RunProgress = None) -> None:
+        """Terminates the running process once the watchdog has tripped.
+
+        Args:
+            progress (RunProgress): New progress to check first.
+        """
+        reason = self.watchdog.reason
+        if progress is not None:
+            reason = self.watchdog.update(progress)
+        if reason is not None and self.failure_reason is None:
+            self.failure_reason = reason
+            if self.process.returncode is None:
+                self.process.terminate()
+
+    def call_watched(self, command: Union[str, List[str]] = None) -> None:
+        """Runs star and polls the watchdog until it exits or trips.
+
+        Args:
+            command (str or list): Command to run, star by default.
+        """
+        self.watchdog.start(self.work_path(self.log_dir, self.history_name))
+        process = subprocess.Popen(
+            command or self.path_to_star, cwd=self.work_dir, env=self.get_env()
+        )
+        # star is reaped by a thread, so that its resource usage is kept
+        waiter = threading.Thread(target=self.wait_process, args=(process,))
+        waiter.start()
+        try:
+            while True:
+                waiter.join(self.watchdog.poll_interval)
+                if not waiter.is_alive():
+                    break
+                self.failure_reason = self.watchdog.poll()
+                if self.failure_reason is not None:
+                    process.terminate()
+                    waiter.join(10)
+                    break
+        finally:
+            if waiter.is_alive():
+                process.kill()
+                waiter.join()
+
+    def wait_process(self, process: subprocess.Popen) -> None:
+        """Waits for star to exit and records its resource usage.
+
+        Args:
+            process (Popen): The running star.
+        """
+        self.usage = None
+        if hasattr(os, "wait4"):
+            try:
+                _, status, rusage = os.wait4(process.pid, 0)
+            except ChildProcessError:
+                # already reaped by process itself
+                pass
+            else:
+                process.returncode = os.waitstatus_to_exitcode(status)
+                self.usage = usage_of(rusage)
+        self.returncode = process.wait()
+
+    async def stream_output(
+        self,
+        stream: asyncio.StreamReader,
+        logger: logging.Logger,
+        callbacks: Optional[List[ProgressCallback]],
+    ) -> None:
+        """Logs and buffers the lines of a stream, parsing them for progress.
+
+        Args:
+            stream (StreamReader): stdout or stderr of MESA.
+            logger (Logger): Receives every line.
+            callbacks (list): Functions called with every RunProgress, None
+                to skip parsing the stream.
+        """
+        parser = ProgressParser() if callbacks is not None else None
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            text = line.decode(errors="replace").rstrip("\n")
+            self.output.append(text)
+            logger.info(text)
+            if parser is None:
+                continue
+            progress = parser.feed(text)
+            if progress is None:
+                continue
+            self.progress = progress
+            for callback in callbacks:
+                result = callback(progress)
+                if inspect.isawaitable(result):
+                    await result
+
+    def run_support(self, inlist: str, check_age: bool, photo: str = None) -> None:
         """Helper function for running MESA.
 
         Args:
             inlist (str): Inlist to run.
             check_age (bool): Check whether the output
                               model has the desired max_age.
+            photo (str): Restart the run from this photo.
         """
+        inList = self.prepare_run(inlist, self.pause)
+        start_time = datetime.datetime.now()
+        start_model = self.start_model(inList, photo)
+        key = self.cache_key(inList)
+        if (
+            photo is None
+            and key is not None
+            and self.restore_run(key, inList, inlist, check_age)
+        ):
+            self.record_metrics(
+                inList, inlist, start_time, restored=True, start_model=start_model
+            )
+            return
+
+        start_time = datetime.datetime.now()
+        if os.path.isfile(self.work_path(self.path_to_star)):
+            if photo is None:
+                print("Running", inlist)
+                command = self.path_to_star
+            else:
+                print("Restarting", inlist, "with photo", photo)
+                command = ["./re", photo]
+            if self.watchdog is None:
+                with subprocess.Popen(
+                    command, cwd=self.work_dir, env=self.get_env()
+                ) as process:
+                    try:
+                        self.wait_process(process)
+                    except BaseException:
+                        process.kill()
+                        raise
+            else:
+                self.call_watched(command)
+        else:
+            print("You need to build star first!")
+            sys.exit()
+        end_time = datetime.datetime.now()
+        self.check_run(inList, inlist, check_age, end_time - start_time)
+        self.store_run(key, inlist, check_age, end_time - start_time)
+        self.record_metrics(
+            inList, inlist, start_time, end_time - start_time, start_model=start_model
+        )
 
-        # to-do: implement option to store terminal
-        # output in a log file
-        if self.inlist != "inlist":
-            self.remove_file("inlist")
-        self.remove_file("restart_photo")
-        copy2(self.inlist, "inlist")
+    def prepare_run(self, inlist: str, pause: bool) -> MesaInlist:
+        """Copies an inlist into the work directory and sets the run options.
+
+        Args:
+            inlist (str): Inlist to run.
+            pause (bool): Wait for user input at the end of the run.
+
+        Returns:
+            inList (MesaInlist): The inlist MESA will read.
+        """
+        work_inlist = self.work_path("inlist")
+        if not (os.path.exists(work_inlist) and os.path.samefile(inlist, work_inlist)):
+            # unlink first, the work directory may share files with a template
+            self.remove_file(work_inlist)
+            copy2(inlist, work_inlist)
+        self.remove_file(self.work_path("restart_photo"))
         inList = MesaInlist(
-            infile="inlist",
-            outfile="inlist",
+            infile=work_inlist,
+            outfile=work_inlist,
             expandVectors=self.expandVectors,
             reloadDefaults=self.reloadDefaults,
             useMesaenv=self.useMesaenv,
@@ -124,7 +497,20 @@ class MesaRunner:
         except KeyError:
             self.history_name = "history.data"
 
-        if self.pause:
+        try:
+            self.log_dir = inList["log_directory"]
+        except KeyError:
+            self.log_dir = "LOGS"
+
+        try:
+            self.photo_dir = inList["photo_directory"]
+        except KeyError:
+            self.photo_dir = "photos"
+        self.failure_reason = None
+        self.progress = None
+        self.usage = None
+
+        if pause:
             inList["pause_before_terminate"] = True
         else:
             inList["pause_before_terminate"] = False
@@ -134,27 +520,48 @@ class MesaRunner:
         else:
             inList["pgstar_flag"] = False
 
-        inList.writeInlist()
+        inList.writeInlist(preserveLayout=True)
 
-        self.remove_file(self.model_name)
-        self.remove_file(self.profile_name)
+        self.remove_file(self.work_path(self.model_name))
+        self.remove_file(self.work_path(self.profile_name))
+        return inList
 
-        start_time = datetime.datetime.now()
-        if os.path.isfile(self.path_to_star):
-            print("Running", inlist)
-            subprocess.call(self.path_to_star)
-        else:
-            print("You need to build star first!")
-            sys.exit()
-        end_time = datetime.datetime.now()
-        run_time = str(end_time - start_time)
+    def check_run(
+        self,
+        inList: MesaInlist,
+        inlist: str,
+        check_age: bool,
+        elapsed: datetime.timedelta,
+    ) -> None:
+        """Checks whether a finished run converged and reports it.
+
+        Args:
+            inList (MesaInlist): The inlist MESA read.
+            inlist (str): Name of the inlist, used in messages.
+            check_age (bool): Check whether the output
+                              model has the desired max_age.
+            elapsed (timedelta): Run time.
+        """
+        run_time = str(elapsed)
         self.run_time = run_time
         micro_index = run_time.find(".")
 
+        if self.failure_reason is not None:
+            print(42 * "%")
+            print("Watchdog stopped the run:", self.failure_reason)
+            print(
+                "Failed to complete",
+                inlist,
+                f"after {run_time[:micro_index]} h:mm:ss",
+            )
+            print(42 * "%")
+            self.convergence = False
+            return
+
         if check_age:
-            if os.path.isfile(self.profile_name):
-                md = mr.MesaData(self.profile_name)
-                star_age = md.star_age
+            if os.path.isfile(self.work_path(self.profile_name)):
+                header = read_header(self.work_path(self.profile_name))
+                star_age = header["star_age"]
                 max_age = inList["max_age"]
 
                 if star_age < max_age:
@@ -187,7 +594,7 @@ class MesaRunner:
                 self.convergence = False
 
         else:
-            if os.path.isfile(self.model_name):
+            if os.path.isfile(self.work_path(self.model_name)):
                 print(42 * "%")
                 print(
                     "Evolving the star took:",
@@ -206,47 +613,276 @@ class MesaRunner:
                 print(42 * "%")
                 self.convergence = False
 
+    def record_metrics(
+        self,
+        inList: MesaInlist,
+        inlist: str,
+        start_time: datetime.datetime,
+        elapsed: datetime.timedelta = None,
+        restored: bool = False,
+        start_model: int = None,
+    ) -> RunMetrics:
+        """Collects the metrics of a finished run and records them.
+
+        The final model number, retries and the final age are read from the
+        last row of the history, if it was written during the run, or from
+        the last terminal output otherwise. The number of models evolved is
+        counted from start_model, since later stages of a chain and
+        restarts continue the numbering of the model they start from.
+
+        Args:
+            inList (MesaInlist): The inlist MESA read.
+            inlist (str): Name of the inlist.
+            start_time (datetime): Start of the run.
+            elapsed (timedelta): Run time, until now by default.
+            restored (bool): Whether the run was restored from the run cache.
+            start_model (int): Model number the run started from, see
+                start_model. The number of models is None without it.
+
+        Returns:
+            metrics (RunMetrics): Also stored in self.metrics.
+        """
+        if elapsed is None:
+            elapsed = datetime.datetime.now() - start_time
+        row = {}
+        history = self.work_path(self.log_dir, self.history_name)
+        try:
+            if restored or os.path.getmtime(history) >= start_time.timestamp():
+                row = read_last_row(history)
+        except (OSError, ValueError):
+            pass
+        progress = self.progress
+        last_model = row.get(
+            "model_number", progress.model_number if progress else None
+        )
+        models = None
+        if last_model is not None and start_model is not None:
+            models = last_model - start_model
+        retries = row.get("num_retries", progress.retries if progress else None)
+        star_age = row.get("star_age", progress.age if progress else None)
+
+        threads = self.env.get("OMP_NUM_THREADS", os.environ.get("OMP_NUM_THREADS"))
+        params, inlist_hash = {}, None
+        if self.run_db is not None:
+            # bookkeeping must never mask the outcome of the run
+            try:
+                params = inlist_params(inList)
+                inlist_hash = params_hash(params)
+            except (OSError, KeyError, ValueError) as error:
+                print(f"Could not read the parameters of {inlist}: {error}")
+        usage: Usage = self.usage if not restored else None
+        self.metrics = RunMetrics(
+            started=start_time.isoformat(),
+            inlist=inlist,
+            work_dir=os.path.abspath(self.work_dir),
+            host=socket.gethostname(),
+            threads=int(threads) if threads and threads.isdigit() else None,
+            inlist_hash=inlist_hash,
+            params=params,
+            convergence=bool(self.convergence),
+            restored=restored,
+            failure_reason=self.failure_reason,
+            returncode=None if restored else self.returncode,
+            wall_time=elapsed.total_seconds(),
+            user_time=usage[0] if usage else None,
+            system_time=usage[1] if usage else None,
+            max_rss=usage[2] if usage else None,
+            models=models,
+            retries=retries,
+            star_age=star_age,
+        )
+        if self.run_db is not None:
+            try:
+                self.run_db.record(self.metrics)
+            except sqlite3.Error as error:
+                print(f"Could not record the run in {self.run_db.path}: {error}")
+        return self.metrics
+
+    def start_model(self, inList: MesaInlist, photo: str = None) -> Optional[int]:
+        """Returns the model number a prepared run starts from.
+
+        Must be called before MESA starts, since a restart rewrites the
+        history.
+
+        Args:
+            inList (MesaInlist): The inlist MESA will read.
+            photo (str): Photo the run restarts from.
+
+        Returns:
+            model_number (int): The model number of the photo, set with
+                initial_model_number or of the loaded model, 0 for a model
+                MESA creates. None if it cannot be determined.
+        """
+        try:
+            if photo is not None:
+                # photo names only keep the last photo_digits digits, the
+                # history tells which model they belong to
+                match = photo_regex.match(photo)
+                if match is None:
+                    return None
+                number = int(match.group(1))
+                history = self.work_path(self.log_dir, self.history_name)
+                near = read_last_row(history).get("model_number")
+                if near is None:
+                    return number
+                return photo_model_number(number, len(match.group(1)), near)
+            if inList["set_initial_model_number"]:
+                return inList["initial_model_number"]
+            if inList["load_saved_model"]:
+                return read_model_number(self.work_path(inList["saved_model_name"]))
+        except (KeyError, OSError, ValueError):
+            return None
+        return 0
+
+    def cache_key(self, inList: MesaInlist) -> Optional[str]:
+        """Returns the run cache key of a prepared run, None without a cache."""
+        if self.run_cache is None or not os.path.isfile(
+            self.work_path(self.path_to_star)
+        ):
+            return None
+        return run_key(inList, self.work_dir, self.path_to_star)
+
+    def restore_run(
+        self, key: str, inList: MesaInlist, inlist: str, check_age: bool
+    ) -> bool:
+        """Restores the outputs of a cached run and checks them.
+
+        Args:
+            key (str): Run cache key of the run.
+            inList (MesaInlist): The inlist MESA would read.
+            inlist (str): Name of the inlist, used in messages.
+            check_age (bool): Check whether the output
+                              model has the desired max_age.
+
+        Returns:
+            convergence (bool): Whether a converged run was restored.
+        """
+        meta = self.run_cache.restore(key, self.work_dir)
+        if meta is None:
+            return False
+        print("Restoring", inlist, "from run cache entry", key[:12])
+        elapsed = datetime.timedelta(seconds=meta["seconds"])
+        self.check_run(inList, inlist, check_age, elapsed)
+        if not self.convergence:
+            # e.g. stored without check_age, run it after all
+            self.remove_file(self.work_path(self.model_name))
+            self.remove_file(self.work_path(self.profile_name))
+        return self.convergence
+
+    def store_run(
+        self,
+        key: Optional[str],
+        inlist: str,
+        check_age: bool,
+        elapsed: datetime.timedelta,
+    ) -> None:
+        """Adds the outputs of a converged run to the run cache."""
+        if key is None or not self.convergence:
+            return
+        self.run_cache.store(
+            key,
+            self.work_dir,
+            files=[self.model_name, self.profile_name],
+            dirs=[self.log_dir],
+            meta={
+                "inlist": inlist,
+                "check_age": check_age,
+                "seconds": elapsed.total_seconds(),
+            },
+        )
+
     def restart(self, photo: str) -> None:
         """Restarts the run from the given photo.
 
         Args:
             photo (str): Photo to run from in the photos directory.
         """
-        if not (os.path.isfile("inlist")):
-            copy2(self.last_inlist, "inlist")
+        if not (os.path.isfile(self.work_path("inlist"))):
+            copy2(self.last_inlist, self.work_path("inlist"))
 
-        photo_path = os.path.join("photos", photo)
+        photo_path = self.work_path(self.photo_dir, photo)
         if os.path.isfile(photo_path):
-            subprocess.call(["./re", photo])
+            subprocess.call(["./re", photo], cwd=self.work_dir, env=self.get_env())
         else:
             print(photo_path, "not found")
 
     def restart_latest(self) -> None:
-        """Restarts the run from the latest photo."""
-        old_path = os.getcwd()
-        new_path = os.path.expanduser("photos")
-        os.chdir(new_path)
-        latest_file = max(glob.iglob("*"), key=os.path.getctime)
-        os.chdir(old_path)
-
-        if not (os.path.isfile("inlist")):
-            copy2(self.last_inlist, "inlist")
-
-        if latest_file:
-            print("Restarting with photo", latest_file)
-            subprocess.call(["./re", latest_file])
+        """Restarts the run from the photo that was written last."""
+        latest = self.photo_index().latest()
+
+        if not (os.path.isfile(self.work_path("inlist"))):
+            copy2(self.last_inlist, self.work_path("inlist"))
+
+        if latest is not None:
+            print("Restarting with photo", latest[1])
+            subprocess.call(["./re", latest[1]], cwd=self.work_dir, env=self.get_env())
         else:
             print("No photo found.")
 
-    def copy_logs(self, dir_name: str) -> None:
+    def photo_index(self) -> PhotoIndex:
+        """Returns the index of the photos in the work directory."""
+        photo_dir = self.work_path(self.photo_dir)
+        if self.photos is None or self.photos.photo_dir != photo_dir:
+            self.photos = PhotoIndex(photo_dir)
+        return self.photos
+
+    def write_chain_state(self, stage: int, started_ns: int = None) -> None:
+        """Records the progress of a list of inlists in the work directory.
+
+        Args:
+            stage (int): Index of the running or next inlist.
+            started_ns (int): Start of the running inlist, None if it did
+                not start yet.
+        """
+        state = {"inlists": list(self.inlist), "stage": stage, "started_ns": started_ns}
+        path = self.work_path(chain_state)
+        with open(path + ".tmp", "w") as file:
+            json.dump(state, file)
+        os.replace(path + ".tmp", path)
+
+    def resume_point(self) -> Tuple[int, Optional[str]]:
+        """Finds where an interrupted run of the same list of inlists stopped.
+
+        Returns:
+            stage, photo (tuple): Index of the first inlist to run and the
+                photo to restart it from, None to run it from the start.
+        """
+        try:
+            with open(self.work_path(chain_state)) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return 0, None
+        if state.get("inlists") != list(self.inlist):
+            return 0, None
+        stage = state["stage"]
+        if stage >= len(self.inlist) or state["started_ns"] is None:
+            return stage, None
+        latest = self.photo_index().latest(since_ns=state["started_ns"])
+        return stage, latest[1] if latest is not None else None
+
+    def copy_logs(
+        self, dir_name: str, method: str = "auto", pack: str = None
+    ) -> ArchiveStats:
         """Save the current logs and profile.
 
+        Files that were copied to dir_name before and did not change since
+        are skipped.
+
         Args:
             dir_name (str): Destination to copy the logs to.
+            method (str): "auto" clones the files where the file system
+                supports reflinks and copies them otherwise, "link"
+                hardlinks them and "copy" always copies them.
+            pack (str): Pack the logs and profile into a single archive
+                dir_name.tar.<pack> instead, with "gz", "bz2", "xz" or ""
+                for no compression.
+
+        Returns:
+            stats (ArchiveStats): Files archived and the time it took.
         """
         if not (self.profile_name):
             inList = MesaInlist(
-                infile="inlist",
+                infile=self.work_path("inlist"),
                 outfile="foo",
                 expandVectors=self.expandVectors,
                 reloadDefaults=self.reloadDefaults,
@@ -256,50 +892,108 @@ class MesaRunner:
             ).inlist
             self.profile_name = inList["filename_for_profile_when_terminate"]
 
-        dst = os.path.join(dir_name, self.profile_name)
-        copy_tree("LOGS", dir_name)
-        if os.path.isfile(self.profile_name):
-            move(self.profile_name, dst)
+        logs = self.work_path(self.log_dir)
+        profile = self.work_path(self.profile_name)
+        if pack is not None:
+            archive = f"{dir_name}.tar" + (f".{pack}" if pack else "")
+            extra = [profile] if os.path.isfile(profile) else []
+            stats = pack_tree(
+                logs, archive, pack, os.path.basename(os.path.normpath(dir_name)), extra
+            )
+            self.remove_file(profile)
+            print("Packed", logs, "into", archive + ":", stats)
+        else:
+            stats = archive_tree(logs, dir_name, method)
+            if os.path.isfile(profile):
+                move(profile, os.path.join(dir_name, self.profile_name))
+            print("Copied", logs, "to", dir_name + ":", stats)
+        return stats
+
+    def work_path(self, *names: str) -> str:
+        """Returns the path of a file in the work directory."""
+        return os.path.join(self.work_dir, *names)
+
+    def get_env(self) -> Optional[Dict[str, str]]:
+        """Returns the environment MESA is run with."""
+        if not self.env:
+            return None
+        env = dict(os.environ)
+        env.update(self.env)
+        return env
 
     @staticmethod
-    def make() -> None:
-        """Builds the star executable."""
-        print("Building star")
-        subprocess.call("./mk")
+    def make(work_dir: str = ".", build_dir: str = None, force: bool = False) -> bool:
+        """Builds the star executable.
+
+        The build is skipped if the sources, makefiles, MESA version and
+        compiler environment did not change since the last build.
+
+        Args:
+            work_dir (str): Directory to build star in.
+            build_dir (str): Build star in this directory instead and link
+                it into work_dir, so all work directories share one star.
+            force (bool): Build even if nothing changed.
+
+        Returns:
+            built (bool): Whether ./mk was run.
+        """
+        built = build_star(build_dir or work_dir, force)
+        if build_dir is not None:
+            star = os.path.join(build_dir, "star")
+            work_star = os.path.join(work_dir, "star")
+            if os.path.isfile(star) and not (
+                os.path.exists(work_star) and os.path.samefile(star, work_star)
+            ):
+                link_file(star, work_star)
+        return built
 
     @staticmethod
     def cleanup(
-        keep_png: bool = False, keep_logs: bool = False, keep_photos: bool = True
-    ) -> None:
+        keep_png: bool = False,
+        keep_logs: bool = False,
+        keep_photos: bool = True,
+        work_dir: Union[str, Sequence[str]] = ".",
+        keep_last_photos: int = None,
+        profile_stride: int = None,
+        keep_newer: float = None,
+        threads: int = None,
+        profile_prefix: str = "profile",
+        profiles_index: str = "profiles.index",
+    ) -> int:
         """Cleans the photos, png and logs directories.
 
         Args:
             keep_png (bool): Store/delete the png directory.
             keep_logs (bool): Store/delete the logs directory.
             keep_photos (bool): Store/delete the photo directory.
+            work_dir (str or list): Directory containing them, or a list of
+                run directories to clean at once.
+            keep_last_photos (int): Number of most recent photos to keep.
+                The older photos are removed, even if keep_photos is set.
+            profile_stride (int): Keep every k-th profile and the last one
+                instead of the whole logs directory. The profiles are taken
+                from the profile index.
+            keep_newer (float): Keep files modified less than this many
+                seconds ago.
+            threads (int): Threads scanning directories and removing files.
+            profile_prefix (str): profile_data_prefix of the runs.
+            profiles_index (str): profiles_index_name of the runs.
+
+        Returns:
+            removed (int): Number of files removed.
         """
-        if not (keep_png):
-            dir_name = "png"
-            if os.path.isdir(dir_name):
-                items = os.listdir(dir_name)
-                for item in items:
-                    if item.endswith(".png"):
-                        os.remove(os.path.join(dir_name, item))
-
-        if not (keep_logs):
-            dir_name = "LOGS"
-            if os.path.isdir(dir_name):
-                items = os.listdir(dir_name)
-                for item in items:
-                    if item.endswith(".data") or item.endswith(".index"):
-                        os.remove(os.path.join(dir_name, item))
-
-        if not (keep_photos):
-            dir_name = "photos"
-            if os.path.isdir(dir_name):
-                items = os.listdir(dir_name)
-                for item in items:
-                    os.remove(os.path.join(dir_name, item))
+        return clean_run_dirs(
+            work_dir,
+            keep_png=keep_png,
+            keep_logs=keep_logs,
+            keep_photos=keep_photos,
+            keep_last_photos=keep_last_photos,
+            profile_stride=profile_stride,
+            keep_newer=keep_newer,
+            threads=threads,
+            profile_prefix=profile_prefix,
+            profiles_index=profiles_index,
+        )
 
     @staticmethod
     def remove_file(file_name: str) -> None:
@@ -0,0 +1,237 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, Union
+
+from mesatools.runner import MesaRunner
+from mesatools.utils.fileops import link_tree
+
+
+class MesaScheduler:
+    """Runs several independent MESA runs concurrently.
+
+    Every run gets its own work directory, populated with hardlinks to a
+    template directory that contains star, re and the input files, so runs
+    never share inlists, photos or logs. The available cores are split
+    between the runs through OMP_NUM_THREADS.
+
+    Attributes:
+        runs (list): Inlist or list of inlists (a chain) for every run.
+        template (str): Directory containing star, re and input files.
+        work_root (str): Directory the work directories are created in.
+        processes (int): Number of concurrent runs.
+        threads (int): OMP_NUM_THREADS of every run.
+        summary (np.ndarray): Whether each run converged.
+        results (list): Details of every run, see run_job.
+    """
+
+    def __init__(
+        self,
+        runs: Sequence[Union[str, List[str]]],
+        template: str = ".",
+        work_root: str = "runs",
+        processes: int = None,
+        threads: int = None,
+        **kwargs: Any,
+    ):
+        """__init__ method
+
+        Args:
+            runs (list): Inlist or list of inlists (a chain) for every run.
+            template (str): Directory containing star, re and input files.
+            work_root (str): Directory the work directories are created in.
+            processes (int): Number of concurrent runs, derived from threads
+                and the number of cores by default.
+            threads (int): OMP_NUM_THREADS of every run, the cores divided
+                by processes by default.
+            **kwargs: Arguments passed on to MesaRunner. pgstar and pause
+                default to False.
+        """
+        self.runs = list(runs)
+        self.template = template
+        self.work_root = work_root
+        self.processes, self.threads = self.partition_cores(
+            len(self.runs), processes, threads
+        )
+        self.kwargs = dict(pgstar=False, pause=False)
+        self.kwargs.update(kwargs)
+        self.summary = None
+        self.results = []
+
+    def run(self, check_age: bool = True) -> List[Dict[str, Any]]:
+        """Runs all inlists and collects their results.
+
+        Args:
+            check_age (bool): Check whether the output
+                              models have the desired max_age.
+
+        Returns:
+            results (list): Details of every run, in the order of runs.
+        """
+        import numpy as np
+
+        jobs = [
+            {
+                "index": index,
+                "inlist": inlist,
+                "work_dir": self.work_dir(index),
+                "template": self.template,
+                "threads": self.threads,
+                "check_age": check_age,
+                "kwargs": self.kwargs,
+            }
+            for index, inlist in enumerate(self.runs)
+        ]
+        if self.processes == 1:
+            self.results = [run_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                self.results = list(executor.map(run_job, jobs))
+
+        self.summary = np.array([r["convergence"] for r in self.results], dtype=bool)
+        print(42 * "%")
+        print(f"Converged {self.summary.sum()} of {len(self.summary)} runs")
+        for result in self.results:
+            if not result["convergence"]:
+                reason = result["error"] or "did not converge"
+                print("Failed", result["work_dir"] + ":", reason)
+        print(42 * "%")
+        return self.results
+
+    def work_dir(self, index: int) -> str:
+        return os.path.join(self.work_root, f"run_{index:04d}")
+
+    @staticmethod
+    def partition_cores(
+        num_runs: int, processes: int = None, threads: int = None
+    ) -> Tuple[int, int]:
+        """Splits the available cores between concurrent runs.
+
+        Args:
+            num_runs (int): Number of runs.
+            processes (int): Requested number of concurrent runs.
+            threads (int): Requested threads per run.
+
+        Returns:
+            processes, threads (tuple): Concurrent runs and threads per run.
+        """
+        cores = (
+            len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+        )
+        cores = cores or os.cpu_count() or 1
+        if processes is None and threads is None:
+            processes = min(num_runs, cores)
+        if processes is None:
+            processes = cores // threads
+        processes = max(1, min(processes, num_runs))
+        if threads is None:
+            threads = cores // processes
+        return processes, max(1, threads)
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs a single job of MesaScheduler in its own work directory.
+
+    Returns:
+        result (dict): index, inlist, work_dir, convergence, summary of the
+            chain, run_time and the error that stopped the run, if any.
+    """
+    work_dir = job["work_dir"]
+    os.makedirs(work_dir, exist_ok=True)
+    threads = job["threads"]
+    runner = MesaRunner(
+        infile=job["inlist"],
+        work_dir=work_dir,
+        env={"OMP_NUM_THREADS": str(threads)} if threads else None,
+        **job["kwargs"],
+    )
+    error = None
+    with redirect_output(os.path.join(work_dir, "mesatools.log")):
+        try:
+            link_tree(job["template"], work_dir)
+            runner.run(check_age=job["check_age"])
+        except (SystemExit, Exception) as exc:
+            error = format_error(exc)
+    return summarize_run(job["index"], runner, error)
+
+
+async def run_concurrently(
+    runners: Sequence[MesaRunner],
+    check_age: bool = True,
+    limit: int = None,
+    **kwargs: Any,
+) -> List[Dict[str, Any]]:
+    """Awaits several runners from a single process.
+
+    The runners must have different work directories.
+
+    Args:
+        runners (list): Runners to run.
+        check_age (bool): Check whether the output
+                          models have the desired max_age.
+        limit (int): Maximum number of simultaneous runs.
+        **kwargs: Arguments passed on to MesaRunner.run_async.
+
+    Returns:
+        results (list): Details of every run, see run_job.
+    """
+    semaphore = asyncio.Semaphore(limit or len(runners) or 1)
+
+    async def run_one(index: int, runner: MesaRunner) -> Dict[str, Any]:
+        error = None
+        async with semaphore:
+            try:
+                await runner.run_async(check_age=check_age, **kwargs)
+            except (SystemExit, Exception) as exc:
+                error = format_error(exc)
+        return summarize_run(index, runner, error)
+
+    return list(
+        await asyncio.gather(
+            *(run_one(index, runner) for index, runner in enumerate(runners))
+        )
+    )
+
+
+def summarize_run(index: int, runner: MesaRunner, error: str = None) -> Dict[str, Any]:
+    if isinstance(runner.inlist, list):
+        summary = [bool(converged) for converged in runner.summary]
+    else:
+        summary = bool(runner.convergence)
+    return {
+        "index": index,
+        "inlist": runner.inlist,
+        "work_dir": runner.work_dir,
+        "convergence": bool(runner.convergence) and error is None,
+        "summary": summary,
+        "run_time": runner.run_time,
+        "error": error or runner.failure_reason,
+    }
+
+
+def format_error(exc: BaseException) -> str:
+    if isinstance(exc, SystemExit):
+        return " ".join(str(arg) for arg in exc.args) or "aborted"
+    return f"{type(exc).__name__}: {exc}"
+
+
+@contextmanager
+def redirect_output(path: str) -> Iterator[None]:
+    """Sends stdout and stderr of this process and its children to path."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with open(path, "a") as file:
+        os.dup2(file.fileno(), 1)
+        os.dup2(file.fileno(), 2)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
@@ -0,0 +1,209 @@
+import re
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+keyRegex = re.compile(r"^\s*([A-Za-z]\w*)\s*(?:\([^)]*\))?\s*=")
+
+
+class KeyInfo(NamedTuple):
+    """Schema entry of a single MESA key.
+
+    Attributes:
+        section (str): Namelist section the key belongs to.
+        default (Any): Default value (first element for vectors).
+        defaultType (type): Type of the default value.
+        isVector (bool): Whether the key is a fortran vector.
+        bounds (tuple): First and last valid index of a one-dimensional
+            vector, the last one None if the defaults do not fix it. None
+            for scalars and higher-dimensional vectors.
+    """
+
+    section: str
+    default: Any
+    defaultType: type
+    isVector: bool
+    bounds: Optional[Tuple[int, Optional[int]]]
+
+
+class DefaultsSchema(Mapping):
+    """Hash index mapping every default MESA key to its KeyInfo.
+
+    The key -> section index is built up front from the key names only.
+    The defaults of a section are loaded the first time one of its keys
+    needs a default value or type, and compiled into KeyInfo entries.
+
+    Args:
+        sectionKeys (Mapping): {section: key names} in lookup priority order.
+        loaders (Mapping): {section: callable returning {key: default}}.
+        boundsLoaders (Mapping): {section: callable returning
+            {key: (first, last)}} of the vectors, loaded with the defaults.
+    """
+
+    def __init__(
+        self,
+        sectionKeys: Mapping[str, Iterable[str]],
+        loaders: Mapping[str, Callable[[], Mapping]],
+        boundsLoaders: Mapping[str, Callable[[], Mapping]] = None,
+    ) -> None:
+        self.sections = tuple(sectionKeys.keys())
+        self._sections: Dict[str, str] = {}
+        for section, keys in sectionKeys.items():
+            for key in keys:
+                self._sections.setdefault(key, section)
+        self._loaders = dict(loaders)
+        self._boundsLoaders = dict(boundsLoaders or {})
+        self._defaults: Dict[str, Mapping] = {}
+        self._bounds: Dict[str, Mapping] = {}
+        self._index: Dict[str, KeyInfo] = {}
+
+    def __getitem__(self, key: str) -> KeyInfo:
+        try:
+            return self._index[key]
+        except KeyError:
+            pass
+        section = self.getSection(key)
+        default = self.getDefaults(section)[key]
+        bounds = self.getBounds(section).get(key) if isinstance(default, list) else None
+        self._index[key] = self.compileKey(section, default, bounds)
+        return self._index[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._sections
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sections)
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def getSection(self, key: str) -> str:
+        try:
+            return self._sections[key]
+        except KeyError:
+            raise KeyError(f"{key} is not a default MESA key.") from None
+
+    def getDefaults(self, section: str) -> Mapping:
+        """Returns the defaults of a section, loading them on first use."""
+        if section not in self._defaults:
+            self._defaults[section] = self._loaders[section]()
+        return self._defaults[section]
+
+    def getBounds(self, section: str) -> Mapping:
+        """Returns {key: (first, last)} of the vectors of a section."""
+        if section not in self._bounds:
+            loader = self._boundsLoaders.get(section)
+            self._bounds[section] = loader() if loader is not None else {}
+        return self._bounds[section]
+
+    def checkIndex(self, key: str, vectorKey: str, index: int) -> None:
+        """Checks a vector index against the bounds of the vector.
+
+        Raises:
+            KeyError: If the index is out of bounds.
+        """
+        bounds = self[vectorKey].bounds
+        if bounds is None:
+            return
+        first, last = bounds
+        if index < first or (last is not None and index > last):
+            limit = f"{first}:{last}" if last is not None else f"{first}:"
+            raise KeyError(f"{key} is out of the bounds ({limit}) of {vectorKey}.")
+
+    def isLoaded(self, section: str) -> bool:
+        return section in self._defaults
+
+    def checkType(self, key: str, value: Any, vectorKey: str = None) -> Optional[str]:
+        """Checks value against the default type of key.
+
+        Args:
+            key (str): Key as given by the user, used in messages.
+            value (Any): Value to check.
+            vectorKey (str): Schema key if key has a vector index.
+
+        Returns:
+            msg (str): Warning for int/float mismatches, None otherwise.
+
+        Raises:
+            TypeError: If the types are not compatible.
+        """
+        info = self[key if vectorKey is None else vectorKey]
+        defaultType = info.defaultType
+        if isinstance(value, defaultType):
+            return None
+
+        valueType = type(value)
+        if (issubclass(defaultType, float) and isinstance(value, int)) or (
+            issubclass(defaultType, int) and isinstance(value, float)
+        ):
+            msg = f"Warning: default type for {key} is {defaultType},"
+            msg = msg + f" but value is {valueType}"
+            return msg
+        else:
+            msg = f"default type for {key} is {defaultType},"
+            msg = msg + f" which is not compatible with type {valueType}"
+            raise TypeError(msg)
+
+    @staticmethod
+    def compileKey(
+        section: str, default: Any, bounds: Sequence[Optional[int]] = None
+    ) -> KeyInfo:
+        if isinstance(default, list):
+            first = default[0] if default else None
+            bounds = tuple(bounds) if bounds is not None else None
+            return KeyInfo(section, first, type(first), True, bounds)
+        else:
+            return KeyInfo(section, default, type(default), False, None)
+
+
+class LazySections(Mapping):
+    """Read-only {section: {key: default}} view that loads sections on access.
+
+    Args:
+        schema (DefaultsSchema): Schema providing the section defaults.
+        sections (list): Sections available through the view.
+    """
+
+    def __init__(self, schema: DefaultsSchema, sections: Iterable[str]) -> None:
+        self.schema = schema
+        self.sections = tuple(sections)
+
+    def __getitem__(self, section: str) -> Mapping:
+        if section not in self.sections:
+            raise KeyError(section)
+        return self.schema.getDefaults(section)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sections)
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+
+def scanKeys(src: str) -> Tuple[str, ...]:
+    """Lists the key names of a .defaults file without parsing the values.
+
+    Args:
+        src (str): Path to the .defaults file.
+
+    Returns:
+        keys (tuple): Lower-case key names in order of appearance.
+    """
+    keys = {}
+    with open(src) as file:
+        for line in file:
+            if line.lstrip().startswith("!"):
+                continue
+            match = keyRegex.match(line)
+            if match:
+                keys[match.group(1).lower()] = None
+    return tuple(keys)
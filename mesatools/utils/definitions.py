@@ -29,3 +29,10 @@ mesaEnv = "MESA_DIR"
 defaultsPath = "star/defaults/"
 eos_defaultsPath = "eos/defaults/"
 kap_defaultsPath = "kap/defaults/"
+
+cacheEnv = "MESATOOLS_CACHE_DIR"
+cacheFormat = 2
+
+# read_extra_*_inlist chains, as limited by MESA
+maxExtraInlists = 5
+maxInlistLevel = 10
@@ -0,0 +1,274 @@
+import hashlib
+import os
+import sys
+import time
+from shutil import copy2, copystat
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# directories MESA writes its output to, never shared with a template
+output_dirs = ("LOGS", "photos", "png")
+
+# ioctl cloning a file on Linux file systems with reflinks (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+archive_methods = ("auto", "link", "copy")
+
+# binary caches reader.read_data writes next to history and profile files,
+# about as large as the files and rebuilt from them when missing
+sidecar_suffixes = (".npy", ".npy.json")
+
+
+# {(path, inode, size, mtime): sha256} of files hashed in this process
+digest_cache: Dict[Tuple, str] = {}
+
+
+def file_digest(file_name: str) -> str:
+    """Returns the sha256 of a file, reusing it while the file is unchanged."""
+    stat = os.stat(file_name)
+    stamp = (os.path.abspath(file_name), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if stamp not in digest_cache:
+        digest = hashlib.sha256()
+        with open(file_name, "rb") as file:
+            for block in iter(lambda: file.read(2**20), b""):
+                digest.update(block)
+        digest_cache[stamp] = digest.hexdigest()
+    return digest_cache[stamp]
+
+
+class ArchiveStats(NamedTuple):
+    """What archiving a directory did.
+
+    Attributes:
+        files (int): Files archived.
+        skipped (int): Files skipped, since they were archived before.
+        size (int): Bytes archived.
+        seconds (float): Time it took.
+    """
+
+    files: int
+    skipped: int
+    size: int
+    seconds: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} files ({self.size / 2**20:.1f} MiB) in"
+            f" {self.seconds:.2f} s, {self.skipped} unchanged files skipped"
+        )
+
+
+def is_sidecar(name: str) -> bool:
+    return name.endswith(sidecar_suffixes)
+
+
+def link_file(src: str, dst: str) -> None:
+    """Hardlinks src to dst, copying it if a link is not possible.
+
+    Args:
+        src (str): Existing file.
+        dst (str): New file, replaced if it exists.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # e.g. a different file system or links not supported
+        copy2(src, dst)
+
+
+def link_tree(src: str, dst: str, exclude: Iterable[str] = ("inlist",)) -> None:
+    """Populates dst with hardlinks to the files in src.
+
+    The files are shared with src, so they must not be modified in place.
+    MESA only creates new output files, which breaks the link. The output
+    directories are created empty instead of being linked.
+
+    Args:
+        src (str): Template directory.
+        dst (str): Directory to populate, created if necessary.
+        exclude (Iterable): Names in the top level of src to skip.
+    """
+    exclude = set(exclude) | set(output_dirs)
+    os.makedirs(dst, exist_ok=True)
+    for root, dirs, files in os.walk(src):
+        rel = os.path.relpath(root, src)
+        if rel == os.curdir:
+            dirs[:] = [name for name in dirs if name not in exclude]
+            files = [name for name in files if name not in exclude]
+            target = dst
+        else:
+            target = os.path.join(dst, rel)
+            os.makedirs(target, exist_ok=True)
+        for name in files:
+            link_file(os.path.join(root, name), os.path.join(target, name))
+    for name in output_dirs:
+        os.makedirs(os.path.join(dst, name), exist_ok=True)
+
+
+def reflink_file(src: str, dst: str) -> bool:
+    """Clones src to dst, sharing its blocks until either is modified.
+
+    Args:
+        src (str): Existing file.
+        dst (str): New file, which must not exist.
+
+    Returns:
+        cloned (bool): False if the file system does not support it.
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        with open(src, "rb") as source, open(dst, "xb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        if os.path.lexists(dst):
+            os.remove(dst)
+        return False
+    copystat(src, dst)
+    return True
+
+
+def archive_file(src: str, dst: str, method: str = "auto") -> bool:
+    """Copies a file into an archive.
+
+    Args:
+        src (str): Existing file.
+        dst (str): New file, replaced if it exists.
+        method (str): "auto" clones the file where the file system supports
+            reflinks and copies it otherwise, "link" hardlinks it and
+            "copy" always copies it.
+
+    Returns:
+        cloned (bool): Whether the file was cloned with a reflink.
+    """
+    if method not in archive_methods:
+        raise ValueError(f"{method} is not a valid option, use auto, link or copy")
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if method == "auto" and reflink_file(src, dst):
+        return True
+    if method == "link":
+        link_file(src, dst)
+    else:
+        copy2(src, dst)
+    return False
+
+
+def archive_tree(src: str, dst: str, method: str = "auto") -> ArchiveStats:
+    """Incrementally archives the files in src to dst.
+
+    Files whose size and modification time match the archived file are
+    skipped, so archiving the logs of a run repeatedly only copies the
+    profiles written in between and the files MESA appended to. The
+    sidecars of read_data are not archived.
+
+    Hardlinked files are shared with src. MESA appends to the history in
+    place, so "link" is meant for logs that are removed, not rewritten,
+    before the next run.
+
+    Args:
+        src (str): Directory to archive.
+        dst (str): Archive directory, created if necessary.
+        method (str): "auto", "link" or "copy", see archive_file.
+
+    Returns:
+        stats (ArchiveStats): Files archived and skipped.
+    """
+    if method not in archive_methods:
+        raise ValueError(f"{method} is not a valid option, use auto, link or copy")
+    start = time.perf_counter()
+    files = skipped = size = 0
+    stack = [(src, dst)]
+    while stack:
+        source, target = stack.pop()
+        os.makedirs(target, exist_ok=True)
+        with os.scandir(source) as entries:
+            for entry in entries:
+                target_path = os.path.join(target, entry.name)
+                if entry.is_dir():
+                    stack.append((entry.path, target_path))
+                    continue
+                if is_sidecar(entry.name):
+                    continue
+                stat = entry.stat()
+                try:
+                    archived = os.stat(target_path)
+                except OSError:
+                    archived = None
+                if (
+                    archived is not None
+                    and archived.st_size == stat.st_size
+                    and archived.st_mtime_ns == stat.st_mtime_ns
+                ):
+                    skipped += 1
+                    continue
+                cloned = archive_file(entry.path, target_path, method)
+                if method == "auto" and not cloned:
+                    # no reflinks on this file system, do not try again
+                    method = "copy"
+                files += 1
+                size += stat.st_size
+    return ArchiveStats(files, skipped, size, time.perf_counter() - start)
+
+
+def pack_tree(
+    src: str,
+    archive: str,
+    compression: str = "gz",
+    arcname: str = None,
+    extra: Iterable[str] = (),
+) -> ArchiveStats:
+    """Packs a directory into a single tar archive.
+
+    The archive is written under a temporary name and renamed when it is
+    complete. The sidecars of read_data are left out.
+
+    Args:
+        src (str): Directory to pack.
+        archive (str): Archive file, replaced if it exists.
+        compression (str): "gz", "bz2", "xz" or "" for none.
+        arcname (str): Directory name inside the archive, the name of src
+            by default.
+        extra (Iterable): Further files, added next to the contents of src.
+
+    Returns:
+        stats (ArchiveStats): Files packed.
+    """
+    if compression not in ("gz", "bz2", "xz", ""):
+        raise ValueError(f"{compression} is not a valid option, use gz, bz2 or xz")
+    import tarfile
+
+    arcname = arcname or os.path.basename(os.path.normpath(src))
+    start = time.perf_counter()
+    files = size = 0
+
+    def count(info: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        nonlocal files, size
+        if info.isfile() and is_sidecar(info.name):
+            return None
+        if info.isfile():
+            files += 1
+            size += info.size
+        return info
+
+    tmp_archive = archive + ".tmp"
+    try:
+        with tarfile.open(tmp_archive, f"w:{compression}") as tar:
+            tar.add(src, arcname=arcname, filter=count)
+            for name in extra:
+                tar.add(
+                    name,
+                    arcname=os.path.join(arcname, os.path.basename(name)),
+                    filter=count,
+                )
+        os.replace(tmp_archive, archive)
+    finally:
+        if os.path.lexists(tmp_archive):
+            os.remove(tmp_archive)
+    return ArchiveStats(files, 0, size, time.perf_counter() - start)
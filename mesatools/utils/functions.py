@@ -1,12 +1,12 @@
 import glob
 import os
+from typing import TYPE_CHECKING
 
-from numpy.typing import ArrayLike
+if TYPE_CHECKING:
+    from numpy.typing import ArrayLike
 
-from mesatools.inlist import MesaInlist
 
-
-def get_X(Z: ArrayLike) -> ArrayLike:
+def get_X(Z: "ArrayLike") -> "ArrayLike":
     """Calculates the hydrogen fraction given
         a heavy-element fraction Z and assuming protosolar
         composition.
@@ -26,7 +26,7 @@ def get_X(Z: ArrayLike) -> ArrayLike:
     return X
 
 
-def get_Y(Z: ArrayLike) -> ArrayLike:
+def get_Y(Z: "ArrayLike") -> "ArrayLike":
     """Calculates the helium fraction given
         a heavy-element fraction Z and assuming protosolar
         composition.
@@ -56,6 +56,8 @@ def get_latest_log(
         Returns:
             latest_log (str): filename of most recent profile
     """
+    from mesatools.inlist import MesaInlist
+
     ma = MesaInlist(
         infile=infile,
         outfile="foo",
@@ -0,0 +1,202 @@
+import os
+import time
+from typing import List, Optional
+
+from mesatools.progress import RunProgress
+from mesatools.reader import history_names_line
+
+
+class HistoryTail:
+    """Incrementally reads the rows MESA appends to a history file.
+
+    Only complete lines are consumed, so a row that is still being written
+    is picked up by the next poll. Rows that existed when the tail was
+    created are skipped. If the file is replaced or truncated it is read
+    again from the start.
+
+    Args:
+        path (str): History file, which does not need to exist yet.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.columns = None
+        self.offset = 0
+        self.line_number = 0
+        self.inode = None
+        try:
+            stat = os.stat(path)
+            self.skip = (stat.st_ino, stat.st_size)
+        except OSError:
+            self.skip = None
+
+    def poll(self) -> List[RunProgress]:
+        """Returns the progress of every model added since the last poll."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+        if self.skip is not None and (
+            stat.st_ino != self.skip[0] or stat.st_size < self.skip[1]
+        ):
+            # replaced or truncated since the tail was created
+            self.skip = None
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode = stat.st_ino
+            self.columns = None
+            self.offset = 0
+            self.line_number = 0
+        if stat.st_size == self.offset:
+            return []
+
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            data = file.read(stat.st_size - self.offset)
+        end = data.rfind(b"\n") + 1
+        position = self.offset
+        self.offset += end
+
+        rows = []
+        for raw in data[:end].splitlines(keepends=True):
+            position += len(raw)
+            self.line_number += 1
+            line = raw.decode(errors="replace")
+            if self.line_number == history_names_line:
+                self.columns = {name: i for i, name in enumerate(line.split())}
+                if self.skip is not None and self.skip[1] > position:
+                    # the rows of an earlier run are skipped, newer rows
+                    # are read by the next poll
+                    self.offset = self.skip[1]
+                    self.skip = None
+                    break
+                self.skip = None
+            elif self.columns is not None and line.strip():
+                progress = self.parse_row(line.split())
+                if progress is not None:
+                    rows.append(progress)
+        return rows
+
+    def parse_row(self, values: List[str]) -> Optional[RunProgress]:
+        def get(name: str, default: float = 0) -> float:
+            index = self.columns.get(name)
+            return float(values[index]) if index is not None else default
+
+        try:
+            return RunProgress(
+                model_number=int(get("model_number")),
+                age=get("star_age"),
+                log_dt=get("log_dt", float("nan")),
+                zones=int(get("num_zones")),
+                retries=int(get("num_retries")),
+            )
+        except (ValueError, IndexError):
+            return None
+
+
+class Watchdog:
+    """Decides when a running MESA model should be given up.
+
+    The watchdog is fed RunProgress events, from the streamed terminal
+    output and from the history file, and trips as soon as one of the
+    configured criteria is met. Criteria left at None are not checked.
+
+    Args:
+        min_log_dt (float): Floor for log10 of the timestep in years.
+        min_log_dt_models (int): Number of models the timestep may stay
+            below min_log_dt.
+        stall_seconds (float): Maximum time without a new model.
+        max_retries (int): Maximum number of retries.
+        tail_history (bool): Read progress from the history file.
+        poll_interval (float): Seconds between polls of the history file.
+
+    Attributes:
+        reason (str): Why the watchdog tripped, None while it has not.
+        progress (RunProgress): Latest progress seen.
+    """
+
+    def __init__(
+        self,
+        min_log_dt: float = None,
+        min_log_dt_models: int = 10,
+        stall_seconds: float = None,
+        max_retries: int = None,
+        tail_history: bool = True,
+        poll_interval: float = 5.0,
+    ) -> None:
+        self.min_log_dt = min_log_dt
+        self.min_log_dt_models = min_log_dt_models
+        self.stall_seconds = stall_seconds
+        self.max_retries = max_retries
+        self.tail_history = tail_history
+        self.poll_interval = poll_interval
+        self.start()
+
+    def start(self, history_path: str = None) -> None:
+        """Resets the watchdog for a new run.
+
+        Args:
+            history_path (str): History file of the run.
+        """
+        self.reason = None
+        self.progress = None
+        self.low_dt_since = None
+        self.last_model_time = time.monotonic()
+        self.history = None
+        if self.tail_history and history_path is not None:
+            self.history = HistoryTail(history_path)
+
+    def update(self, progress: RunProgress) -> Optional[str]:
+        """Checks a progress event against the criteria.
+
+        Args:
+            progress (RunProgress): Progress of the run.
+
+        Returns:
+            reason (str): Why the watchdog tripped, None if it has not.
+        """
+        if self.reason is not None:
+            return self.reason
+        if self.progress is not None:
+            if progress.model_number < self.progress.model_number:
+                # an older model reported by the slower of the two sources
+                return None
+            if progress.model_number > self.progress.model_number:
+                self.last_model_time = time.monotonic()
+        self.progress = progress
+
+        if self.min_log_dt is not None:
+            if progress.log_dt < self.min_log_dt:
+                if self.low_dt_since is None:
+                    self.low_dt_since = progress.model_number
+                models = progress.model_number - self.low_dt_since
+                if models >= self.min_log_dt_models:
+                    self.reason = (
+                        f"log_dt below {self.min_log_dt} for {models} models"
+                        f" (model {progress.model_number}, log_dt {progress.log_dt:.3f})"
+                    )
+            else:
+                self.low_dt_since = None
+
+        if self.max_retries is not None and progress.retries > self.max_retries:
+            self.reason = (
+                f"{progress.retries} retries, more than {self.max_retries}"
+                f" (model {progress.model_number})"
+            )
+        return self.reason
+
+    def poll(self) -> Optional[str]:
+        """Reads the history file and checks for a stall.
+
+        Returns:
+            reason (str): Why the watchdog tripped, None if it has not.
+        """
+        if self.history is not None:
+            for progress in self.history.poll():
+                if self.update(progress):
+                    break
+        if self.reason is None and self.stall_seconds is not None:
+            stalled = time.monotonic() - self.last_model_time
+            if stalled > self.stall_seconds:
+                model = self.progress.model_number if self.progress else None
+                self.reason = f"no new model for {stalled:.0f} s (model {model})"
+        return self.reason
@@ -0,0 +1,279 @@
+import json
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from mesatools.scheduler import run_job
+
+queue_dirs = ("pending", "running", "done", "failed", "tmp")
+
+
+class WorkQueue:
+    """Job queue in a directory, shared by any number of worker processes.
+
+    Every job is a JSON file that moves from pending to running to done or
+    failed. Jobs are claimed by renaming them, which is atomic, so workers
+    on several nodes of a shared file system never run the same job. A
+    worker touches the file of its job while running it; jobs whose file
+    has not been touched for a while belong to a dead worker and are put
+    back into pending.
+
+    Args:
+        root (str): Directory of the queue, created if necessary.
+        max_attempts (int): Number of times a job is started before it is
+            given up, if its workers keep dying.
+    """
+
+    def __init__(self, root: str, max_attempts: int = 3) -> None:
+        self.root = root
+        self.max_attempts = max_attempts
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        for name in queue_dirs:
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def path(self, state: str, job_id: str = None) -> str:
+        if job_id is None:
+            return os.path.join(self.root, state)
+        return os.path.join(self.root, state, job_id + ".json")
+
+    def enqueue(
+        self,
+        runs: Sequence[Union[str, List[str]]],
+        check_age: bool = True,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Adds runs to the queue.
+
+        Args:
+            runs (list): Inlist or list of inlists (a chain) for every run.
+            check_age (bool): Check whether the output
+                              models have the desired max_age.
+            **kwargs: Arguments passed on to MesaRunner, they must be JSON
+                serializable.
+
+        Returns:
+            job_ids (list): Ids of the new jobs, in the order they are run.
+        """
+        job_ids = []
+        for index, inlist in enumerate(runs):
+            job_id = f"{time.time_ns():020d}-{os.getpid()}-{index:06d}"
+            job = {
+                "id": job_id,
+                "inlist": inlist,
+                "check_age": check_age,
+                "kwargs": kwargs,
+                "attempts": 0,
+            }
+            self.write(job, self.path("pending", job_id))
+            job_ids.append(job_id)
+        return job_ids
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Takes the oldest pending job.
+
+        Returns:
+            job (dict): The claimed job, None if no job is pending.
+        """
+        for name in sorted(os.listdir(self.path("pending"))):
+            job_id = name[: -len(".json")]
+            claim_path = os.path.join(self.path("tmp"), f"{name}.{self.worker}.claim")
+            try:
+                os.rename(self.path("pending", job_id), claim_path)
+            except FileNotFoundError:
+                # claimed by another worker
+                continue
+            with open(claim_path) as file:
+                job = json.load(file)
+            job["attempts"] += 1
+            job["worker"] = self.worker
+            job["claimed"] = time.time()
+            with open(claim_path, "w") as file:
+                json.dump(job, file)
+            os.rename(claim_path, self.path("running", job_id))
+            return job
+        return None
+
+    def heartbeat(self, job: Dict[str, Any]) -> bool:
+        """Marks a running job as alive.
+
+        Returns:
+            alive (bool): False if the job was requeued in the meantime.
+        """
+        try:
+            os.utime(self.path("running", job["id"]))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def finish(self, job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Records the result of a job and moves it to done or failed.
+
+        Args:
+            job (dict): The claimed job.
+            result (dict): Result of the run, see scheduler.run_job.
+        """
+        job = dict(job, result=result, finished=time.time())
+        state = "done" if result.get("convergence") else "failed"
+        self.write(job, self.path(state, job["id"]))
+        for path in (self.path("running", job["id"]), self.path("pending", job["id"])):
+            # the job may have been requeued if a heartbeat was missed
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def requeue_stale(self, timeout: float) -> List[str]:
+        """Puts the jobs of dead workers back into pending.
+
+        Args:
+            timeout (float): Seconds without a heartbeat after which the
+                worker of a job is considered dead.
+
+        Returns:
+            job_ids (list): Ids of the requeued jobs.
+        """
+        now = time.time()
+        requeued = []
+        stale = [
+            (os.path.join(self.path("running"), name), name[: -len(".json")])
+            for name in os.listdir(self.path("running"))
+        ] + [
+            # claimed, but never moved to running
+            (os.path.join(self.path("tmp"), name), name.split(".json.")[0])
+            for name in os.listdir(self.path("tmp"))
+            if name.endswith(".claim")
+        ]
+        for path, job_id in stale:
+            try:
+                # renames only change ctime, heartbeats change both
+                stat = os.stat(path)
+                if now - max(stat.st_mtime, stat.st_ctime) < timeout:
+                    continue
+                requeue_path = os.path.join(
+                    self.path("tmp"), f"{job_id}.{self.worker}.requeue"
+                )
+                os.rename(path, requeue_path)
+            except FileNotFoundError:
+                # finished or requeued by another worker
+                continue
+            with open(requeue_path) as file:
+                job = json.load(file)
+            os.remove(requeue_path)
+            if job["attempts"] >= self.max_attempts:
+                job["result"] = {
+                    "convergence": False,
+                    "error": f"worker died in {job['attempts']} attempts",
+                }
+                self.write(job, self.path("failed", job_id))
+            else:
+                self.write(job, self.path("pending", job_id))
+                requeued.append(job_id)
+        return requeued
+
+    def status(self) -> Dict[str, int]:
+        """Returns the number of jobs in every state."""
+        return {
+            state: len(os.listdir(self.path(state)))
+            for state in ("pending", "running", "done", "failed")
+        }
+
+    def results(self) -> List[Dict[str, Any]]:
+        """Returns the finished jobs, done and failed, in queue order."""
+        jobs = []
+        for state in ("done", "failed"):
+            for name in os.listdir(self.path(state)):
+                with open(os.path.join(self.path(state), name)) as file:
+                    jobs.append(dict(json.load(file), state=state))
+        return sorted(jobs, key=lambda job: job["id"])
+
+    def work(
+        self,
+        template: str = ".",
+        work_root: str = "runs",
+        threads: int = None,
+        heartbeat_interval: float = 30.0,
+        stale_timeout: float = None,
+        wait: bool = False,
+        poll_interval: float = 10.0,
+        max_jobs: int = None,
+        **kwargs: Any,
+    ) -> int:
+        """Runs jobs from the queue until it is empty.
+
+        Every job runs in its own work directory, populated from template
+        as in MesaScheduler. Start this in any number of processes.
+
+        Args:
+            template (str): Directory containing star, re and input files.
+            work_root (str): Directory the work directories are created in.
+            threads (int): OMP_NUM_THREADS of every run, inherited by
+                default.
+            heartbeat_interval (float): Seconds between heartbeats.
+            stale_timeout (float): Requeue jobs without a heartbeat for this
+                many seconds, not checked by default. Must be well above
+                heartbeat_interval.
+            wait (bool): Keep polling while other workers are running jobs,
+                which may be requeued, instead of stopping once no job is
+                pending.
+            poll_interval (float): Seconds between polls when waiting.
+            max_jobs (int): Stop after this many jobs.
+            **kwargs: Arguments passed on to MesaRunner, overridden by the
+                arguments given to enqueue. pgstar and pause default to
+                False.
+
+        Returns:
+            jobs (int): Number of jobs this worker ran.
+        """
+        ran = 0
+        while max_jobs is None or ran < max_jobs:
+            if stale_timeout is not None:
+                self.requeue_stale(stale_timeout)
+            job = self.claim()
+            if job is None:
+                if wait and self.status()["running"]:
+                    time.sleep(poll_interval)
+                    continue
+                break
+
+            stop = threading.Event()
+            beat = threading.Thread(
+                target=self.beat, args=(job, heartbeat_interval, stop), daemon=True
+            )
+            beat.start()
+            try:
+                result = run_job(
+                    {
+                        "index": ran,
+                        "inlist": job["inlist"],
+                        "work_dir": os.path.join(work_root, job["id"]),
+                        "template": template,
+                        "threads": threads,
+                        "check_age": job["check_age"],
+                        "kwargs": {
+                            "pgstar": False,
+                            "pause": False,
+                            **kwargs,
+                            **job["kwargs"],
+                        },
+                    }
+                )
+            finally:
+                stop.set()
+                beat.join()
+            self.finish(job, result)
+            ran += 1
+        return ran
+
+    def beat(self, job: Dict[str, Any], interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            if not self.heartbeat(job):
+                break
+
+    def write(self, job: Dict[str, Any], path: str) -> None:
+        """Writes a job file atomically."""
+        tmp_path = os.path.join(
+            self.path("tmp"), f"{os.path.basename(path)}.{self.worker}.write"
+        )
+        with open(tmp_path, "w") as file:
+            json.dump(job, file, default=str)
+        os.replace(tmp_path, path)
@@ -9,5 +9,7 @@ setup(
     author_email="simonandres.mueller@uzh.ch",
     license="GNU GPLv3",
     packages=find_packages(include=["mesatools", "mesatools.*"]),
-    install_requires=["numpy", "matplotlib", "f90nml", "mesa_reader"]
+    install_requires=["numpy", "matplotlib", "f90nml"],
+    # the benchmarks compare mesatools.reader against mesa_reader
+    extras_require={"bench": ["mesa_reader"]},
 )